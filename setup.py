@@ -27,5 +27,8 @@ setup(name='snoPlowPy',
       packages=find_packages(),
       install_requires=[
           'future',
-      ]
+      ],
+      extras_require={
+          'fast': ['orjson'],
+      }
       )
@@ -2,12 +2,24 @@
 
 from __future__ import print_function
 import os
-import json
+import threading
+import collections
+from concurrent.futures import ThreadPoolExecutor
 from .files_and_paths import Dirs, Urls
 from .utils import Utils
+from .fast_json import FastJson
+from .json_store import JsonStore
 
 
 class Biosample:
+    # Biosample.get/getMany keep the CacheSize most recently used
+    # Biosamples, and fetch up to Workers at once
+    CacheSize = 4096
+    Workers = 8
+
+    _lock = threading.Lock()
+    _cache = collections.OrderedDict()
+
     def __init__(self, accessionID, force=False):
         self.accessionID = accessionID
 
@@ -16,12 +28,65 @@ class Biosample:
         self.jsonUrl = os.path.join(Urls.base, "biosamples", accessionID,
                                     "?format=json")
 
-        Utils.download(self.jsonUrl, self.jsonFnp, True, force,
-                       skipSizeCheck=True)
-        with open(self.jsonFnp) as f:
-            self.jsondata = json.load(f)
+        store = JsonStore.default()
+        if store:
+            self.jsondata = store.fetch("biosample", accessionID, self.jsonUrl,
+                                        force)
+        else:
+            Utils.download(self.jsonUrl, self.jsonFnp, True, force,
+                           skipSizeCheck=True)
+            self.jsondata = FastJson.loadFile(self.jsonFnp)
         self._parse()
 
+    @classmethod
+    def _cached(cls, accessionID):
+        with cls._lock:
+            ret = cls._cache.pop(accessionID, None)
+            if ret is not None:
+                cls._cache[accessionID] = ret  # now most recently used
+            return ret
+
+    @classmethod
+    def _remember(cls, b):
+        with cls._lock:
+            cls._cache.pop(b.accessionID, None)
+            cls._cache[b.accessionID] = b
+            while len(cls._cache) > cls.CacheSize:
+                cls._cache.popitem(last=False)
+
+    @classmethod
+    def clearCache(cls):
+        with cls._lock:
+            cls._cache.clear()
+
+    @classmethod
+    def get(cls, accessionID, force=False):
+        # Biosample(accessionID), reused while in the process-level cache
+        ret = None if force else cls._cached(accessionID)
+        if ret is None:
+            ret = cls(accessionID, force)
+            cls._remember(ret)
+        return ret
+
+    @classmethod
+    def getMany(cls, accessionIDs, force=False):
+        # accessionID -> Biosample for each of accessionIDs, those not cached
+        # fetched concurrently
+        ret = {}
+        missing = []
+        for accessionID in sorted(set(accessionIDs)):
+            b = None if force else cls._cached(accessionID)
+            if b is None:
+                missing.append(accessionID)
+            else:
+                ret[accessionID] = b
+        if missing:
+            with ThreadPoolExecutor(min(cls.Workers, len(missing))) as pool:
+                for b in pool.map(lambda a: cls(a, force), missing):
+                    cls._remember(b)
+                    ret[b.accessionID] = b
+        return ret
+
     def __repr__(self):
         return "\t".join([self.accessionID, self.biosample_term_id,
                           self.biosample_term_name, self.biosample_type])
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+
+from __future__ import print_function
+import os
+import time
+import zlib
+import sqlite3
+
+from .files_and_paths import Dirs
+from .sqlite_db import SqliteDb
+from .utils import Utils
+
+
+class ResponseCache(SqliteDb):
+    # URL -> response body, zlib-compressed in one sqlite file; entries
+    # expire after ttl seconds and the least recently read are evicted once
+    # the compressed total passes max_bytes. Usable as QueryDCC's cache
+    Schema = ["""CREATE TABLE IF NOT EXISTS responses (
+                 url TEXT PRIMARY KEY,
+                 body BLOB,
+                 size INTEGER,
+                 created REAL,
+                 accessed REAL)""",
+              """CREATE INDEX IF NOT EXISTS responses_accessed
+                 ON responses (accessed)"""]
+
+    _default = None
+
+    def __init__(self, fnp, ttl=24 * 60 * 60, max_bytes=512 * 1024 * 1024,
+                 timeout=60):
+        SqliteDb.__init__(self, fnp, timeout)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+    @classmethod
+    def default(cls):
+        if cls._default is None:
+            cls._default = cls(os.path.join(Dirs.encode_base,
+                                            "response_cache.sqlite"))
+        return cls._default
+
+    def get(self, url):
+        rows = self.read("SELECT body, created FROM responses WHERE url = ?",
+                         (url,))
+        if not rows:
+            return None
+        body, created = rows[0]
+        if self.ttl is not None and time.time() - created > self.ttl:
+            self.write("DELETE FROM responses WHERE url = ?", (url,))
+            return None
+        self.write("UPDATE responses SET accessed = ? WHERE url = ?",
+                   (time.time(), url))
+        return zlib.decompress(bytes(body))
+
+    def set(self, url, body):
+        if not isinstance(body, bytes):
+            body = body.encode("utf-8")
+        z = zlib.compress(body)
+        now = time.time()
+        self.write("""INSERT OR REPLACE INTO responses
+                      (url, body, size, created, accessed)
+                      VALUES (?, ?, ?, ?, ?)""",
+                   (url, sqlite3.Binary(z), len(z), now, now))
+        self.evict()
+
+    def getOrSet(self, url, fn, quiet=False):
+        ret = self.get(url)
+        if ret is not None:
+            Utils.quietPrint(quiet, "cached", url)
+            return ret
+        ret = fn()
+        if ret:
+            self.set(url, ret)
+        return ret
+
+    def totalBytes(self):
+        return self.read("SELECT COALESCE(SUM(size), 0) FROM responses")[0][0]
+
+    def evict(self):
+        # drop expired entries, then least recently read until under max_bytes
+        with self._lock:
+            c = self.conn()
+            with c:
+                if self.ttl is not None:
+                    c.execute("DELETE FROM responses WHERE created < ?",
+                              (time.time() - self.ttl,))
+                if self.max_bytes is None:
+                    return
+                excess = c.execute("SELECT COALESCE(SUM(size), 0) FROM responses"
+                                   ).fetchone()[0] - self.max_bytes
+                if excess <= 0:
+                    return
+                urls = []
+                for url, size in c.execute("""SELECT url, size FROM responses
+                                              ORDER BY accessed"""):
+                    if excess <= 0:
+                        break
+                    urls.append((url,))
+                    excess -= size
+                c.executemany("DELETE FROM responses WHERE url = ?", urls)
+
+    def forget(self, url):
+        self.write("DELETE FROM responses WHERE url = ?", (url,))
+
+    def clear(self):
+        self.write("DELETE FROM responses")
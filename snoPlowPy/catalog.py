@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+
+from __future__ import print_function
+import os
+import sys
+import glob
+import argparse
+import traceback
+
+from .files_and_paths import Dirs
+from .sqlite_db import SqliteDb
+from .json_store import JsonStore
+from .exp import Exp
+
+
+class MetadataCatalog(SqliteDb):
+    # experiment and file metadata in indexed sqlite tables, so selections
+    # like "hg19 H3K27ac ChIP-seq in immortalized cell lines" are a query
+    # returning accessions instead of parsing every experiment's JSON
+    ExpColumns = ["assay_term_name", "target", "label", "biosample_term_name",
+                  "biosample_term_id", "biosample_type", "lab", "status"]
+    FileColumns = ["assembly", "file_type", "output_type", "file_format",
+                   "file_status"]
+
+    Schema = ["""CREATE TABLE IF NOT EXISTS experiments (
+                 accession TEXT PRIMARY KEY, %s)""" %
+              ", ".join(c + " TEXT" for c in ExpColumns),
+              """CREATE TABLE IF NOT EXISTS files (
+                 accession TEXT, exp_accession TEXT, %s,
+                 PRIMARY KEY (exp_accession, accession))""" %
+              ", ".join(c + " TEXT" for c in FileColumns)]
+    Schema += ["CREATE INDEX IF NOT EXISTS experiments_%s ON experiments (%s)" % (c, c)
+               for c in ExpColumns]
+    Schema += ["CREATE INDEX IF NOT EXISTS files_%s ON files (%s, exp_accession)" % (c, c)
+               for c in FileColumns]
+
+    _default = None
+
+    @classmethod
+    def default(cls):
+        if cls._default is None or \
+                cls._default.fnp != os.path.join(Dirs.encode_base, "catalog.sqlite"):
+            cls._default = cls(os.path.join(Dirs.encode_base, "catalog.sqlite"))
+        return cls._default
+
+    def addExps(self, exps):
+        expRows = []
+        fileRows = []
+        for exp in exps:
+            expRows.append([exp.encodeID] + [getattr(exp, c) for c in self.ExpColumns])
+            for f in exp.files:
+                fileRows.append([f.fileID, exp.encodeID, f.assembly, f.file_type,
+                                 f.output_type, f.file_format, f.file_status])
+        with self._lock:
+            c = self.conn()
+            with c:
+                # an experiment's rows are replaced as a whole
+                c.executemany("DELETE FROM files WHERE exp_accession = ?",
+                              [(r[0],) for r in expRows])
+                c.executemany("INSERT OR REPLACE INTO experiments VALUES (%s)" %
+                              ", ".join(["?"] * (1 + len(self.ExpColumns))), expRows)
+                c.executemany("INSERT OR REPLACE INTO files VALUES (%s)" %
+                              ", ".join(["?"] * (2 + len(self.FileColumns))), fileRows)
+
+    @staticmethod
+    def cachedAccessions():
+        # experiments with JSON already on disk (or in the JsonStore)
+        store = JsonStore.default()
+        if store:
+            return store.keys("experiment")
+        fnps = glob.glob(os.path.join(Dirs.encode_json, "exps", "*.json"))
+        return sorted(os.path.basename(fnp)[:-len(".json")] for fnp in fnps)
+
+    def build(self, accessionIDs=None, batch=1000, quiet=False):
+        # (re)index accessionIDs, by default every cached experiment, from
+        # their cached JSON; returns the number indexed
+        if accessionIDs is None:
+            accessionIDs = MetadataCatalog.cachedAccessions()
+        exps = []
+        n = 0
+        for accessionID in accessionIDs:
+            try:
+                exps.append(Exp.fromJsonFile(accessionID))
+            except Exception:
+                print("could not index", accessionID)
+                traceback.print_exc()
+            if len(exps) >= batch:
+                self.addExps(exps)
+                n += len(exps)
+                exps = []
+                if not quiet:
+                    print("indexed", "{:,}".format(n))
+        self.addExps(exps)
+        return n + len(exps)
+
+    @staticmethod
+    def _where(table, fields):
+        # col = ?, col IN (...) for lists, col LIKE ? for values with a %
+        clauses = []
+        params = []
+        for k in sorted(fields):
+            v = fields[k]
+            if isinstance(v, (list, tuple, set)):
+                v = list(v)
+                clauses.append("%s.%s IN (%s)" % (table, k, ", ".join(["?"] * len(v))))
+                params += v
+            elif "%" in v:
+                clauses.append("%s.%s LIKE ?" % (table, k))
+                params.append(v)
+            else:
+                clauses.append("%s.%s = ?" % (table, k))
+                params.append(v)
+        return clauses, params
+
+    def query(self, **fields):
+        '''
+        sorted accessions of experiments matching every field, each one of
+        ExpColumns (experiment) or FileColumns (any of its files), e.g.
+        query(assay_term_name="ChIP-seq", label="H3K27ac", assembly="hg19",
+        biosample_type="immortalized cell line") or target="histone%"
+        '''
+        unknown = set(fields) - set(self.ExpColumns) - set(self.FileColumns)
+        if unknown:
+            raise Exception("unknown catalog fields " + ", ".join(sorted(unknown)))
+        expClauses, params = MetadataCatalog._where(
+            "e", {k: v for k, v in fields.items() if k in self.ExpColumns})
+        fileClauses, fileParams = MetadataCatalog._where(
+            "f", {k: v for k, v in fields.items() if k in self.FileColumns})
+        if fileClauses:
+            expClauses.append("""EXISTS (SELECT 1 FROM files f
+                                 WHERE f.exp_accession = e.accession AND %s)""" %
+                              " AND ".join(fileClauses))
+            params += fileParams
+        sql = "SELECT e.accession FROM experiments e"
+        if expClauses:
+            sql += " WHERE " + " AND ".join(expClauses)
+        return [r[0] for r in self.read(sql + " ORDER BY e.accession", params)]
+
+    def queryFiles(self, accessions=None, **fields):
+        # (experiment accession, file accession) of matching files
+        clauses, params = MetadataCatalog._where("f", fields)
+        if accessions is not None:
+            accessions = list(accessions)
+            clauses.append("f.exp_accession IN (%s)" % ", ".join(["?"] * len(accessions)))
+            params += accessions
+        sql = "SELECT f.exp_accession, f.accession FROM files f"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        return self.read(sql + " ORDER BY f.exp_accession, f.accession", params)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="index cached experiment JSON")
+    parser.add_argument('--catalog', type=str, default="")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    catalog = MetadataCatalog(args.catalog) if args.catalog else MetadataCatalog.default()
+    n = catalog.build()
+    print("indexed", "{:,}".format(n), "experiments into", catalog.fnp)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+
+from __future__ import print_function
+import collections
+import itertools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+from future.moves.urllib.parse import urlparse
+
+from .utils import Utils
+
+
+class DownloadEngine(object):
+    # runs many transfers from one process; a task only starts once its
+    # connection slots (one, or several for a segmented download), as many
+    # slots for its host and room in the in-flight byte budget are all
+    # free, so small files keep flowing past big ones
+    # tasks looked at per host queue for one that fits
+    Lookahead = 64
+
+    def __init__(self, max_connections=16, max_per_host=4,
+                 max_inflight_bytes=2 * 1024 ** 3):
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self.max_inflight_bytes = max_inflight_bytes
+
+        self._pool = ThreadPoolExecutor(max_workers=max_connections)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        # host -> its queued tasks, for hosts with any
+        self._pending = collections.OrderedDict()
+        self._running = 0
+        self._perHost = collections.defaultdict(int)
+        self._inflightBytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.shutdown()
+
+    def submit(self, url, num_bytes, fn, *args, **kwargs):
+        # run fn(*args, **kwargs) as a transfer of num_bytes from url;
+        # returns a concurrent.futures.Future
+        return self.submitWide(url, num_bytes, 1, fn, *args, **kwargs)
+
+    def submitWide(self, url, num_bytes, connections, fn, *args, **kwargs):
+        # submit() for a transfer that opens several connections of its own
+        # (Utils.downloadSegmented): it is charged all of them, against both
+        # limits; see maxConnectionsPerTask
+        future = Future()
+        connections = max(1, min(connections, self.maxConnectionsPerTask()))
+        task = (urlparse(url).netloc, max(num_bytes or 0, 0), fn, args, kwargs,
+                future, connections)
+        with self._lock:
+            self._pending.setdefault(task[0], collections.deque()).append(task)
+        self._dispatch(task[0])
+        return future
+
+    def download(self, url, fnp, auth=None, force=None, file_size_bytes=0,
+                 **kwargs):
+        return self.submit(url, file_size_bytes, Utils.download, url, fnp,
+                           auth, force, file_size_bytes, **kwargs)
+
+    def maxConnectionsPerTask(self):
+        # the most connections one task may be given
+        return min(self.max_connections, self.max_per_host)
+
+    def _fits(self, host, task):
+        # room for task's connections, on its host too, and for its bytes; a
+        # file bigger than the whole budget may still run on its own
+        return self._running + task[6] <= self.max_connections and \
+            self._perHost[host] + task[6] <= self.max_per_host and \
+            (not self._inflightBytes or
+             self._inflightBytes + task[1] <= self.max_inflight_bytes)
+
+    def _dispatch(self, first=None):
+        # start what fits, trying host first (the one just queued to or
+        # freed) and then the others; only the first Lookahead tasks of a
+        # host's queue are looked at, and only while connections are free
+        with self._lock:
+            ready = []
+            if self._running >= self.max_connections:
+                return
+            hosts = list(self._pending)
+            if first in self._pending:
+                hosts.remove(first)
+                hosts.insert(0, first)
+            for host in hosts:
+                if self._running >= self.max_connections:
+                    break
+                queue = self._pending[host]
+                started = False
+                while queue and self._running < self.max_connections and \
+                        self._perHost[host] < self.max_per_host:
+                    i = next((i for i, task in
+                              enumerate(itertools.islice(queue, self.Lookahead))
+                              if self._fits(host, task)), None)
+                    if i is None:
+                        break
+                    task = queue[i]
+                    del queue[i]
+                    self._running += task[6]
+                    self._perHost[host] += task[6]
+                    self._inflightBytes += task[1]
+                    ready.append(task)
+                    started = True
+                if not queue:
+                    del self._pending[host]
+                elif started:
+                    # to the back, so hosts take turns
+                    del self._pending[host]
+                    self._pending[host] = queue
+        for task in ready:
+            self._pool.submit(self._run, task)
+
+    def _run(self, task):
+        host, num_bytes, fn, args, kwargs, future, connections = task
+        try:
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except Exception as e:
+                    future.set_exception(e)
+        finally:
+            with self._lock:
+                self._running -= connections
+                self._perHost[host] -= connections
+                self._inflightBytes -= num_bytes
+                self._idle.notify_all()
+            self._dispatch(host)
+
+    @staticmethod
+    def waitAll(futures, quiet=False):
+        # block until every future is done; returns the number that failed
+        futures = list(futures)
+        wait(futures)
+        failed = 0
+        for f in futures:
+            if f.cancelled() or f.exception() is not None:
+                failed += 1
+                Utils.quietPrint(quiet, "download error:",
+                                 "cancelled" if f.cancelled() else f.exception())
+            elif f.result() is False:
+                failed += 1
+        return failed
+
+    @staticmethod
+    def addArgs(parser):
+        parser.add_argument('--engine', action="store_true", default=False,
+                            help="download from one process with a threaded engine")
+        parser.add_argument('--connections', type=int, default=16)
+        parser.add_argument('--per-host', type=int, default=4)
+        parser.add_argument('--inflight-mb', type=int, default=2048)
+
+    @staticmethod
+    def fromArgs(args):
+        if not getattr(args, "engine", False):
+            return None
+        return DownloadEngine(args.connections, args.per_host,
+                              args.inflight_mb * 1024 * 1024)
+
+    def shutdown(self, wait=True):
+        if wait:
+            with self._idle:
+                while self._pending or self._running:
+                    self._idle.wait()
+        self._pool.shutdown(wait)
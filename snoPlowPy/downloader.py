@@ -5,30 +5,56 @@ from __future__ import print_function
 import os
 import sys
 import argparse
-import json
 from .utils import Utils
 from joblib import Parallel, delayed
 import traceback
+from concurrent.futures import as_completed
 
 from .files_and_paths import Datasets
 from .exp import Exp
+from .download_engine import DownloadEngine
+from .metrics import DownloadMetrics
+from .scheduler import Orders, expBytes, scheduleBySize
+from .planner import SyncPlanner
+from .json_stream import iterGraph
+from .fast_json import FastJson
+from .json_store import JsonStore
+
+
+def expJsonForce(accessionID, force, refresh):
+    if force or not Exp.hasCachedJson(accessionID):
+        return True
+    if refresh:
+        # conditional GET; the cached JSON is only replaced if it changed
+        store = JsonStore.default()
+        if store:
+            store.revalidate("experiment", accessionID,
+                             Exp(accessionID).jsonUrl, True, True)
+        else:
+            Utils.revalidate(Exp(accessionID).jsonUrl,
+                             Exp.makeJsonFnp(accessionID), True, True)
+    return False
+
+
+def isBedBigWigHdf5(f):
+    return f.isBed() or f.isBigWig() or f.isGtf() or f.isHdf5() or f.isHotSpot()
+
+
+def isBedBigWigHdf5Json(f):
+    # isBedBigWigHdf5 for a file's raw JSON
+    return f.get("file_format") in ["bed", "gtf", "hdf5"] or \
+        "bigWig" == f.get("file_type") or "hotspots" == f.get("output_type")
 
 
 def loadBedBigWigHdf5Bam(idx, total, accessionID, force, refresh, jsononly):
-    doForce = force
     try:
-        jsonFnp = Exp.makeJsonFnp(accessionID)
-        if not os.path.exists(jsonFnp):
-            doForce = True
-        if refresh:
-            if Utils.fileOlderThanDays(jsonFnp, 14):
-                doForce = True
-        exp = Exp.fromJsonFile(accessionID, doForce)
+        exp = Exp.fromJsonFile(accessionID,
+                               expJsonForce(accessionID, force, refresh))
         print(idx + 1, "of", total, exp.encodeID, exp.assay_term_name,
               exp.label, exp.description)
         if not jsononly:
             for f in exp.files:
-                if f.isBed() or f.isBigWig() or f.isGtf() or f.isHdf5() or f.isHotSpot():
+                if isBedBigWigHdf5(f):
                     f.download()
         print(idx + 1, "of", total, "done")
     except Exception:
@@ -36,27 +62,86 @@ def loadBedBigWigHdf5Bam(idx, total, accessionID, force, refresh, jsononly):
         traceback.print_exc()
 
 
+def loadExpJson(accessionID, force, refresh):
+    # an engine task: revalidating the JSON runs on the engine's workers,
+    # not in the thread queueing the experiments
+    return Exp.fromJsonFile(accessionID, expJsonForce(accessionID, force, refresh))
+
+
+def loadBedBigWigHdf5BamEngine(engine, accessionIDs, force, refresh, jsononly):
+    # experiment JSON and then its files all go through one DownloadEngine,
+    # so transfers for many experiments overlap
+    total = len(accessionIDs)
+    expFutures = {}
+    for accessionID in accessionIDs:
+        future = engine.submit(Exp(accessionID).jsonUrl, 0, loadExpJson,
+                               accessionID, force, refresh)
+        expFutures[future] = accessionID
+
+    fileFutures = []
+    for idx, future in enumerate(as_completed(expFutures)):
+        try:
+            exp = future.result()
+        except Exception as e:
+            print(idx + 1, "of", total, "error", expFutures[future], e)
+            continue
+        print(idx + 1, "of", total, exp.encodeID, exp.assay_term_name,
+              exp.label, exp.description)
+        if not jsononly:
+            fileFutures += [f.download(engine=engine) for f in exp.files
+                            if isBedBigWigHdf5(f)]
+    failed = DownloadEngine.waitAll(fileFutures)
+    print("downloaded", len(fileFutures) - failed, "of", len(fileFutures),
+          "files")
+
+
 class Downloader:
-    def __init__(self, dataset, args):
+    def __init__(self, dataset, args, engine=None, planner=None):
         self.dataset = dataset
         self.species = dataset.species
         self.args = args
+        self.engine = engine
+        self.planner = planner
         self.load()
 
     def load(self):
-        # always redownload search
-        Utils.ensureDir(self.dataset.jsonFnp)
-        Utils.download(self.dataset.url, self.dataset.jsonFnp,
-                       True, self.args.force)
+        self.data = None
+        if self.planner:
+            # dry run: only what is already cached, no network
+            if not os.path.exists(self.dataset.jsonFnp):
+                print("no cached search JSON", self.dataset.jsonFnp)
+                self.data = {"@graph": []}
+                return
+        else:
+            # always redownload search
+            Utils.ensureDir(self.dataset.jsonFnp)
+            Utils.download(self.dataset.url, self.dataset.jsonFnp,
+                           True, self.args.force)
+
+        if getattr(self.args, "stream", False):
+            return  # read experiment by experiment in exps()
+        self.data = FastJson.loadFile(self.dataset.jsonFnp)
 
-        with open(self.dataset.jsonFnp) as f:
-            self.data = json.load(f)
+    def exps(self, assay_term_name=""):
+        # the search's experiments (of assay_term_name, if given); with
+        # --stream parsed one at a time from the cached JSON, so memory stays
+        # flat however big the search gets
+        if self.data is None:
+            graph = iterGraph(self.dataset.jsonFnp)
+        else:
+            graph = self.data["@graph"]
+        for e in graph:
+            if not assay_term_name or assay_term_name == e["assay_term_name"]:
+                yield e
 
     def getFastqsHistone(self, dataset, args):
-        expsJson = filter(lambda e: "ChIP-seq" == e["assay_term_name"],
-                          self.data["@graph"])
-        accessionIDs = sorted([e["accession"] for e in expsJson])
+        accessionIDs = sorted([e["accession"] for e in self.exps("ChIP-seq")])
+        if self.planner:
+            return self.planner.addAccessions(accessionIDs,
+                                              lambda f: f.isFastqOrFasta(),
+                                              lambda e: e.isChipSeqHistoneMark())
         total = len(accessionIDs)
+        futures = []
         for idx, accessionID in enumerate(accessionIDs):
             try:
                 exp = Exp.fromJsonFile(accessionID, False)
@@ -66,17 +151,21 @@ class Downloader:
                     continue
                 for f in exp.files:
                     if f.isFastqOrFasta():
-                        f.download()
+                        futures.append(f.download(engine=self.engine))
                 print(idx + 1, "of", total, "done")
             except Exception:
                 print(idx + 1, "of", total, "error")
                 traceback.print_exc()
+        self._wait(futures)
 
     def getBams(self, dataset, args):
-        expsJson = filter(lambda e: "DNase-seq" == e["assay_term_name"],
-                          self.data["@graph"])
-        accessionIDs = sorted([e["accession"] for e in expsJson])
+        accessionIDs = sorted([e["accession"] for e in self.exps("DNase-seq")])
+        if self.planner:
+            return self.planner.addAccessions(
+                accessionIDs,
+                lambda f: f.isBam() and "Dgf" not in f.submitted_file_name)
         total = len(accessionIDs)
+        futures = []
         for idx, accessionID in enumerate(accessionIDs):
             try:
                 exp = Exp.fromJsonFile(accessionID, False)
@@ -86,15 +175,26 @@ class Downloader:
                     if "Dgf" in f.submitted_file_name:
                         continue
                     print("\t", f.fileID)
-                    f.download()
+                    futures.append(f.download(engine=self.engine))
                 print(idx + 1, "of", total, "done")
             except Exception:
                 print(idx + 1, "of", total, "error")
                 traceback.print_exc()
+        self._wait(futures)
+
+    def _wait(self, futures):
+        # with an engine, download() handed back Futures; block on them here
+        if self.engine:
+            failed = DownloadEngine.waitAll(futures)
+            print("downloaded", len(futures) - failed, "of", len(futures),
+                  "files")
 
     @staticmethod
     def checkBedBigWigHdf5BamParallel(n_jobs, accessionIDs, force, refresh,
-                                      jsononly):
+                                      jsononly, engine=None):
+        if engine:
+            return loadBedBigWigHdf5BamEngine(engine, accessionIDs, force,
+                                              refresh, jsononly)
         t = len(accessionIDs)
         return Parallel(n_jobs=n_jobs)(delayed(loadBedBigWigHdf5Bam)(i, t, e,
                                                                      force,
@@ -103,13 +203,16 @@ class Downloader:
                                        for i, e in enumerate(accessionIDs))
 
     def _checkBedBigWigHdf5(self, assay_term_name, force, refresh, jsononly):
-        expsJson = self.data["@graph"]
-        if assay_term_name:
-            expsJson = filter(lambda e: assay_term_name == e["assay_term_name"],
-                              self.data["@graph"])
-        accessionIDs = sorted([e["accession"] for e in expsJson])
+        # biggest first (or packed per worker) keeps all workers busy to the end
+        sizes = {e["accession"]: expBytes(e, isBedBigWigHdf5Json)
+                 for e in self.exps(assay_term_name)}
+        if self.planner:
+            return self.planner.addAccessions(sorted(sizes), isBedBigWigHdf5)
+        accessionIDs = scheduleBySize(sizes, getattr(self.args, "order", "accession"),
+                                      self.args.j)
         Downloader.checkBedBigWigHdf5BamParallel(self.args.j, accessionIDs,
-                                                 force, refresh, jsononly)
+                                                 force, refresh, jsononly,
+                                                 self.engine)
 
     def chipseqs(self):
         self._checkBedBigWigHdf5("ChIP-seq", self.args.force,
@@ -139,28 +242,54 @@ def parse_args():
     parser.add_argument('--jsononly', action="store_true", default=False)
     parser.add_argument('-j', type=int, default=4)
     parser.add_argument('--ids', type=str, default="")
+    parser.add_argument('--stream', action="store_true", default=False,
+                        help="parse the search JSON one experiment at a time")
+    parser.add_argument('--order', type=str, default="accession", choices=Orders,
+                        help="experiment order: by accession, by total file size"
+                        " (largest/smallest first) or packed per worker (binpack)")
+    parser.add_argument('--metrics-dir', type=str, default="",
+                        help="write per-download JSON lines and a Prometheus textfile here")
+    DownloadEngine.addArgs(parser)
+    SyncPlanner.addArgs(parser)
     args = parser.parse_args()
     return args
 
 
 def main():
     args = parse_args()
+    if not args.metrics_dir:
+        return run(args)
+    metrics = DownloadMetrics.startRun(args.metrics_dir)
+    try:
+        return run(args)
+    finally:
+        metrics.finishRun()
+
+
+def run(args):
+    planner = SyncPlanner.fromArgs(args)
+    if planner:
+        ret = plan(args, planner)
+        planner.report()
+        return ret
+    engine = DownloadEngine.fromArgs(args)
 
     if args.ids:
         accessionIDs = args.ids.split(',')
         Downloader.checkBedBigWigHdf5BamParallel(args.j, accessionIDs, True,
-                                                 args.refresh, args.jsononly)
+                                                 args.refresh, args.jsononly,
+                                                 engine)
         return 0
 
     if args.dnase:
         datasets = [Datasets.all_mouse]
         for dataset in datasets:
-            down = Downloader(dataset, args)
+            down = Downloader(dataset, args, engine)
             down.dnases()
 
     datasets = [Datasets.roadmap, Datasets.all_mouse, Datasets.all_human]
     for dataset in datasets:
-        down = Downloader(dataset, args)
+        down = Downloader(dataset, args, engine)
         if args.fastq:
             down.getFastqsHistone(dataset, args)
         if args.bams:
@@ -171,5 +300,29 @@ def main():
             down.checkAllBedBigWigHdf5(args.force, args.jsononly)
 
 
+def plan(args, planner):
+    # same selection as run(), tallied into planner instead of fetched
+    if args.ids:
+        planner.addAccessions(args.ids.split(','), isBedBigWigHdf5)
+        return 0
+    if args.jsononly:
+        return 0
+
+    if args.dnase:
+        Downloader(Datasets.all_mouse, args, planner=planner).dnases()
+
+    for dataset in [Datasets.roadmap, Datasets.all_mouse, Datasets.all_human]:
+        down = Downloader(dataset, args, planner=planner)
+        if args.fastq:
+            down.getFastqsHistone(dataset, args)
+        if args.bams:
+            down.getBams(dataset, args)
+        elif args.chips:
+            down.chipseqs()
+        else:
+            down.checkAllBedBigWigHdf5(args.force)
+    return 0
+
+
 if __name__ == "__main__":
     sys.exit(main())
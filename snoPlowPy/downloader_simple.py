@@ -7,30 +7,45 @@ import argparse
 import traceback
 
 from .exp import Exp
+from .download_engine import DownloadEngine
+from .metrics import DownloadMetrics
+from .planner import SyncPlanner
 
 
 class DownloaderSimple:
-    def __init__(self, accessionIDs, args):
+    def __init__(self, accessionIDs, args, engine=None):
         self.accessionIDs = accessionIDs
         self._args = args
+        self._engine = engine
+
+    def wants(self, f):
+        return f.isBigBed() or self._args.fastq and f.isFastqOrFasta() \
+            or self._args.tsv and f.isTSV() or self._args.bam and f.isBam() \
+            or self._args.bigwig and f.isBigWig()
 
     def run(self):
         total = len(self.accessionIDs)
+        futures = []
         for idx, accessionID in enumerate(self.accessionIDs):
             try:
                 exp = Exp.fromJsonFile(accessionID, False)
                 print(idx + 1, "of", total, exp.encodeID, exp.assay_term_name,
                       exp.label, exp.description)
                 for f in exp.files:
-                    if f.isBigBed() or self._args.fastq and f.isFastqOrFasta() \
-                            or self._args.tsv and f.isTSV() or self._args.bam and f.isBam() \
-                            or self._args.bigwig and f.isBigWig():
+                    if self.wants(f):
+                        if self._engine:
+                            futures.append(f.download(engine=self._engine))
+                            continue
                         f.download()
                         print(f.fnp())
                 print(idx + 1, "of", total, "done")
             except Exception:
                 print(idx + 1, "of", total, "error")
                 traceback.print_exc()
+        if futures:
+            failed = DownloadEngine.waitAll(futures)
+            print("downloaded", len(futures) - failed, "of", len(futures),
+                  "files")
 
 
 def parse_args():
@@ -41,14 +56,42 @@ def parse_args():
     parser.add_argument('--bam', action="store_true", default=False)
     parser.add_argument('--tsv', action="store_true", default=False)
     parser.add_argument('-f', type=str, default=False)
+    parser.add_argument('--metrics-dir', type=str, default="",
+                        help="write per-download JSON lines and a Prometheus textfile here")
+    DownloadEngine.addArgs(parser)
+    SyncPlanner.addArgs(parser)
     args = parser.parse_args()
     return args
 
 
 def main():
     args = parse_args()
+    if not args.metrics_dir:
+        return run(args)
+    metrics = DownloadMetrics.startRun(args.metrics_dir)
+    try:
+        return run(args)
+    finally:
+        metrics.finishRun()
+
+
+def run(args):
     if args.f:
+        planner = SyncPlanner.fromArgs(args)
+        if planner:
+            with open(args.f, 'r') as f:
+                accessionIDs = [line.strip("\n") for line in f]
+            planner.addAccessions(accessionIDs,
+                                  DownloaderSimple(accessionIDs, args).wants)
+            planner.report()
+            return
+        engine = DownloadEngine.fromArgs(args)
         with open(args.f, 'r') as f:
+            if engine:
+                # one run so the engine can overlap every experiment's files
+                accessionIDs = [line.strip("\n") for line in f]
+                DownloaderSimple(accessionIDs, args, engine).run()
+                return
             for line in f:
                 ds = DownloaderSimple([line.strip("\n")], args)
                 ds.run()
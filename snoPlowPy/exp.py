@@ -2,14 +2,21 @@
 
 from __future__ import print_function
 import os
-import json
 import collections
+from builtins import str
 from .files_and_paths import Dirs, Urls, Genome, Tools
 from .utils import Utils, cat
 from .exp_metadata import ExpMetadata
+from .fast_json import FastJson
+from .parsed_cache import ParsedCache
+from .json_store import JsonStore
+from .http_session import HttpSession
+from .json_stream import iterResponse
 
 
 class Exp(ExpMetadata):
+    __slots__ = ("encodeID", "accessionID", "url", "jsonUrl", "jsonFnp", "_fileIndex")
+
     def __init__(self, encodeID):
         ExpMetadata.__init__(self)
         self.encodeID = encodeID
@@ -18,21 +25,38 @@ class Exp(ExpMetadata):
         self.url = os.path.join(Urls.base, "experiments", encodeID)
         self.jsonUrl = self.url + "/?format=json"
         self.jsonFnp = Exp.makeJsonFnp(encodeID)
+        self._fileIndex = None  # see fileIndex
 
     @staticmethod
     def makeJsonFnp(encodeID):
         return os.path.join(Dirs.encode_json, "exps",
                             encodeID + ".json")
 
+    @staticmethod
+    def hasCachedJson(encodeID):
+        store = JsonStore.default()
+        if store:
+            return store.has("experiment", encodeID)
+        return os.path.exists(Exp.makeJsonFnp(encodeID))
+
     @classmethod
     def fromJsonFile(cls, encodeID, force=False):
         ret = cls(encodeID)
+        store = JsonStore.default()
+        if store:
+            ret.jsondata = store.fetch("experiment", encodeID, ret.jsonUrl, force)
+            ret._parseJson(force)
+            ret.jsondata = None  # reloaded by getExpJson if needed
+            return ret
         if force or not os.path.exists(ret.jsonFnp):
             Utils.download(ret.jsonUrl, ret.jsonFnp, True, force,
                            skipSizeCheck=True)
-        with open(ret.jsonFnp) as f:
-            ret.jsondata = json.load(f)
+        if ParsedCache.load(ret):
+            return ret
+        ret.jsondata = FastJson.loadFile(ret.jsonFnp)
         ret._parseJson(force)
+        ret.jsondata = None  # reloaded by getExpJson if needed
+        ParsedCache.save(ret)
         return ret
 
     @classmethod
@@ -49,6 +73,42 @@ class Exp(ExpMetadata):
         ret._parseWS(rows)
         return ret
 
+    @classmethod
+    def fromWebserviceRows(cls, rows):
+        # one Exp per run of rows with the same accession, as the webservice
+        # returns them; only one experiment's rows are held at a time, so an
+        # accession coming back after another one is an error rather than a
+        # second, partial Exp
+        group = []
+        done = set()
+        for row in rows:
+            accession = row[0]["accession"]
+            if group and accession != group[0][0]["accession"]:
+                done.add(group[0][0]["accession"])
+                yield cls.fromWebservice(group)
+                group = []
+            if accession in done:
+                raise Exception("webservice rows of " + accession +
+                                " are not contiguous")
+            group.append(row)
+        if group:
+            yield cls.fromWebservice(group)
+
+    @classmethod
+    def fromWebserviceUrl(cls, url, key=None):
+        # fromWebserviceRows over a webservice endpoint (e.g.
+        # AllHumanDataset.webserviceAll), parsed as it is read; its rows are
+        # the top-level array, or the one under key
+        r = HttpSession.get(url, stream=True)
+        try:
+            if 200 != r.status_code:
+                raise Exception("could not download " + url +
+                                " status_code: " + str(r.status_code))
+            for exp in cls.fromWebserviceRows(iterResponse(r, key)):
+                yield exp
+        finally:
+            r.close()
+
     def __repr__(self):
         return '\t'.join([self.description, self.assay_term_name,
                           self.target, self.url])
@@ -92,12 +152,16 @@ class Exp(ExpMetadata):
 
     def getExpJson(self):
         if not self.jsondata:
+            store = JsonStore.default()
+            if store:
+                self.jsondata = store.fetch("experiment", self.encodeID,
+                                            self.jsonUrl)
+                return self.jsondata
             fnp = os.path.join(Dirs.encode_json, "exps",
                                self.encodeID + ".json")
             Utils.ensureDir(fnp)
             Utils.download(self.jsonUrl, fnp, True, skipSizeCheck=True)
-            with open(fnp) as f:
-                self.jsondata = json.load(f)
+            self.jsondata = FastJson.loadFile(fnp)
         return self.jsondata
 
     def getMeanBigWigFnp(self, assembly, fnps):
@@ -122,37 +186,84 @@ class Exp(ExpMetadata):
         os.rename(tmpMeanFnp, meanFnp)
         print("\twrote", meanFnp)
 
-    def bigWigFilters(self, assembly):
-        files = filter(lambda x: x.isBigWig(), self.files)
-        bfs = [lambda x: x.output_type == "fold change over control" and x.isPooled,
-               lambda x: x.output_type == "fold change over control" and '1' in x.bio_rep,
-               lambda x: x.output_type == "fold change over control" and '2' in x.bio_rep,
-               lambda x: x.output_type == "fold change over control",
-               lambda x: x.output_type == "signal of unique reads" and x.isPooled,
-               lambda x: x.output_type == "signal of unique reads" and '1' in x.bio_rep,
-               lambda x: x.output_type == "signal of unique reads" and '2' in x.bio_rep,
-               lambda x: x.output_type == "signal of unique reads",
-               lambda x: x.isRawSignal() and x.isPooled,
-               lambda x: x.isRawSignal() and x.bio_rep == '1',
-               lambda x: x.isRawSignal() and x.bio_rep == '2',
-               lambda x: x.isRawSignal(),
-               lambda x: x.isSignal() and x.isPooled,
-               lambda x: x.isSignal() and x.bio_rep == '1',
-               lambda x: x.isSignal() and x.bio_rep == '2',
-               lambda x: x.isSignal()
-               ]
-        for bf in bfs:
-            bws = filter(bf, files)
-            bws = filter(lambda x: x.assembly == assembly, bws)
-            if bws:
-                return bws
+    # bigWigFilters / bedFilters: the files of the first step of the cascade
+    # with any, as (file_type, output_type, replicate shape), None matching
+    # any value
+    BigWigCascade = [("bigWig", ot, shape)
+                     for ot in ["fold change over control", "signal of unique reads"]
+                     for shape in ["pooled", "has1", "has2", None]] + \
+                    [("bigWig", ot, shape)
+                     for ot in ["raw signal", "signal"]
+                     for shape in ["pooled", "is1", "is2", None]]
+    BedCascade = [("bed narrowPeak", "optimal idr thresholded peaks", None),
+                  ("bed narrowPeak", "replicated peaks", None),
+                  ("bed narrowPeak", None, "has1and2"),
+                  ("bed narrowPeak", None, "reps1and2"),
+                  ("bed narrowPeak", None, None),
+                  ("bed broadPeak", None, None),
+                  (None, "peaks", None)]
+
+    # predicates on a file's (isPooled, bio_rep, biological_replicates)
+    ReplicateShapes = {
+        "pooled": lambda pooled, rep, reps: pooled,
+        "has1": lambda pooled, rep, reps: '1' in str(rep),
+        "has2": lambda pooled, rep, reps: '2' in str(rep),
+        "is1": lambda pooled, rep, reps: '1' == str(rep),
+        "is2": lambda pooled, rep, reps: '2' == str(rep),
+        # rep may be a number, a list (as a tuple) or None (webservice rows)
+        "has1and2": lambda pooled, rep, reps: isinstance(rep, (str, tuple)) and
+        '1' in rep and '2' in rep,
+        "reps1and2": lambda pooled, rep, reps: 1 in reps and 2 in reps}
+
+    def fileIndex(self):
+        # assembly -> (file_type, output_type, replicate shape) -> positions
+        # in self.files; built once, from the files' JSON where not yet built
+        if self._fileIndex is None:
+            index = collections.defaultdict(lambda: collections.defaultdict(list))
+            for i in range(len(self.files)):
+                rep = self.files.field(i, "bio_rep")
+                shape = (bool(self.files.field(i, "isPooled")),
+                         tuple(rep) if isinstance(rep, list) else rep,
+                         tuple(self.files.field(i, "biological_replicates") or ()))
+                key = (self.files.field(i, "file_type"),
+                       self.files.field(i, "output_type"), shape)
+                index[self.files.field(i, "assembly")][key].append(i)
+            self._fileIndex = {a: dict(keys) for a, keys in index.items()}
+        return self._fileIndex
+
+    def _selectFiles(self, cascade, assembly):
+        keys = self.fileIndex().get(assembly, {})
+        for file_type, output_type, shape in cascade:
+            idx = []
+            for (ft, ot, s), positions in keys.items():
+                if file_type not in (None, ft) or output_type not in (None, ot):
+                    continue
+                if shape is None or Exp.ReplicateShapes[shape](*s):
+                    idx += positions
+            if idx:
+                return [self.files[i] for i in sorted(idx)]
         return []
 
+    def _selectFilesByAssembly(self, cascade):
+        ret = {}
+        for assembly in self.fileIndex():
+            files = self._selectFiles(cascade, assembly)
+            if files:
+                ret[assembly] = files
+        return ret
+
+    def bigWigFilters(self, assembly):
+        return self._selectFiles(Exp.BigWigCascade, assembly)
+
+    def bigWigFiltersByAssembly(self):
+        # assembly -> bigWigFilters(assembly), for assemblies with any
+        return self._selectFilesByAssembly(Exp.BigWigCascade)
+
     def bamFilters(self):
-        return filter(lambda x: x.isBam(), self.files)
+        return self.files.filterBy(file_type="bam")
 
     def hotSpotFilters(self):
-        return filter(lambda x: x.isBed() and x.isHotSpot(), self.files)
+        return self.files.filterBy(file_format="bed", output_type="hotspots")
 
     def getSingleBigWigSingleFnp(self, assembly, args):
         bigwigs = self.bigWigFilters(assembly)
@@ -247,30 +358,17 @@ class Exp(ExpMetadata):
         print("\twrote", mergeFnp)
 
     def bedFilters(self, assembly):
-        bfs = [
-            lambda x: x.isBedNarrowPeak() and x.isIDRoptimal(),
-            lambda x: x.isBedNarrowPeak() and x.isIDR(),
-            lambda x: x.isBedNarrowPeak() and x.isReplicatedPeaks(),
-            lambda x: x.isBedNarrowPeak() and isinstance(x.bio_rep, collections.Iterable) and
-            '1' in x.bio_rep and '2' in x.bio_rep,
-            lambda x: x.isBedNarrowPeak() and 1 in x.biological_replicates and
-            2 in x.biological_replicates,
-            lambda x: x.isBedNarrowPeak(),
-            lambda x: x.isBedBroadPeak(),
-            lambda x: x.isPeaks()
-        ]
-        for bf in bfs:
-            beds = filter(bf, self.files)
-            beds = filter(lambda x: x.assembly == assembly, beds)
-            if beds:
-                return beds
-        return []
+        return self._selectFiles(Exp.BedCascade, assembly)
+
+    def bedFiltersByAssembly(self):
+        # assembly -> bedFilters(assembly), for assemblies with any
+        return self._selectFilesByAssembly(Exp.BedCascade)
 
     def getPeakFiles(self):
         return self.bedFilters()
 
     def getTADs(self):
-        return filter(lambda x: x.isTAD(), self.files)
+        return self.files.filterBy(output_type="topologically associated domains")
 
     def getIDRnarrowPeak(self, assembly, args):
         beds = self.bedFilters(assembly)
@@ -2,13 +2,23 @@
 
 from __future__ import print_function
 import os
-import json
 from .files_and_paths import Dirs, Urls
 from .utils import Utils
-from .exp_file_metadata import ExpFileMetadata
+from .fast_json import FastJson
+from .json_store import JsonStore
+from .exp_file_metadata import ExpFileMetadata, intern
+from .manifest import DownloadManifest
 
 
 class ExpFile(ExpFileMetadata):
+    __slots__ = ("expID", "fileID")
+
+    # BAM/FASTQ files at least this big are fetched as parallel byte ranges
+    SegmentedMinBytes = 1024 * 1024 * 1024
+    SegmentedConnections = 8
+    # trust/record completed downloads in DownloadManifest.default()
+    UseManifest = True
+
     def __init__(self, expID=None, fileID=None):
         ExpFileMetadata.__init__(self)
         self.expID = expID
@@ -25,20 +35,25 @@ class ExpFile(ExpFileMetadata):
     # in case file JSON is not part of the experiment json, for some unknown reason (revoked?)
     def fromJsonFile(cls, expID, fileID, force):
         ret = cls(expID, fileID)
+        ret._parseJson(expID, fileID, ExpFile.loadJsonFile(expID, fileID, force))
+        return ret
 
+    @staticmethod
+    def loadJsonFile(expID, fileID, force=False):
+        # the file's own JSON, downloaded and cached if need be
         jsonFnp = os.path.join(Dirs.encode_json, "exps", expID, fileID + ".json")
         jsonUrl = Urls.base + "/files/{fileID}/?format=json".format(fileID=fileID)
+        store = JsonStore.default()
+        if store:
+            return store.fetch("file", expID + "/" + fileID, jsonUrl, force)
         Utils.ensureDir(jsonFnp)
         Utils.download(jsonUrl, jsonFnp, True, force, skipSizeCheck=True)
-        with open(jsonFnp) as f:
-            j = json.load(f)
-        ret._parseJson(expID, fileID, j)
-        return ret
+        return FastJson.loadFile(jsonFnp)
 
     @classmethod
     def fromWebservice(cls, expID, r):
         ret = cls(expID, r["file"])
-        ret.parseWS(r)
+        ret._parseWS(r)
         return ret
 
     @classmethod
@@ -115,10 +130,29 @@ class ExpFile(ExpFileMetadata):
     def isTSV(self):
         return "tsv" == self.file_type
 
+    def getJson(self):
+        # raw JSON of the file, only loaded when asked for: from the
+        # experiment's cached JSON, else on its own (like unreleased files)
+        if getattr(self, "jsondata", None) is None:
+            store = JsonStore.default()
+            expFnp = os.path.join(Dirs.encode_json, "exps", self.expID + ".json")
+            expJson = None
+            if store:
+                expJson = store.get("experiment", self.expID)
+            elif os.path.exists(expFnp):
+                expJson = FastJson.loadFile(expFnp)
+            for j in (expJson or {}).get("files", []):
+                if j["accession"] == self.fileID:
+                    self.jsondata = j
+                    return j
+            self.jsondata = ExpFile.loadJsonFile(self.expID, self.fileID)
+        return self.jsondata
+
     def getControls(self):
         x = set()
-        if "derived_from" in self.jsondata:
-            for i in self.jsondata["derived_from"]:
+        g = self.getJson()
+        if "derived_from" in g:
+            for i in g["derived_from"]:
                 if "controlled_by" in i:
                     x.add(i["controlled_by"][0])
         return list(x)
@@ -150,17 +184,171 @@ class ExpFile(ExpFileMetadata):
             ext = ".bigWig"
         return pre + ".norm" + ext
 
-    def download(self, force=None):
-        fnp = self.fnp()
-        Utils.ensureDir(fnp)
-        return Utils.download(self.url, fnp,
-                              True, force, self.file_size_bytes)
+    def isSegmented(self):
+        return (self.file_size_bytes or 0) >= ExpFile.SegmentedMinBytes and \
+            (self.isBam() or self.isFastqOrFasta())
 
-    def downloadPublic(self, force=None):
+    def _download(self, auth, force, connections=None):
         fnp = self.fnp()
-        Utils.ensureDir(fnp)
+        manifest = DownloadManifest.default() if ExpFile.UseManifest else None
+        if self.isSegmented():
+            return Utils.downloadSegmented(self.url, fnp, auth, force,
+                                           self.file_size_bytes,
+                                           md5sum=self.md5sum,
+                                           connections=connections or
+                                           ExpFile.SegmentedConnections,
+                                           manifest=manifest,
+                                           accession=self.fileID)
         return Utils.download(self.url, fnp,
-                              False, force, self.file_size_bytes)
+                              auth, force, self.file_size_bytes,
+                              md5sum=self.md5sum, manifest=manifest,
+                              accession=self.fileID)
+
+    def _submit(self, engine, auth, force):
+        # queue on a DownloadEngine and return its Future; a segmented
+        # download only opens as many connections as the engine charges it
+        if not self.isSegmented():
+            return engine.submit(self.url, self.file_size_bytes,
+                                 self._download, auth, force)
+        n = min(ExpFile.SegmentedConnections, engine.maxConnectionsPerTask())
+        return engine.submitWide(self.url, self.file_size_bytes, n,
+                                 self._download, auth, force, n)
+
+    def download(self, force=None, engine=None):
+        if engine:
+            return self._submit(engine, True, force)
+        return self._download(True, force)
+
+    def downloadPublic(self, force=None, engine=None):
+        if engine:
+            return self._submit(engine, False, force)
+        return self._download(False, force)
 
     def featurename(self):
         return self.fileID
+
+
+class LazyFileList(object):
+    # Exp.files: each ExpFile is only built from its JSON when first
+    # accessed; filterBy() checks plain fields on the JSON itself
+    # ExpFile attribute -> key in the file JSON, for filterBy
+    JsonKeys = {"accession": "accession", "file_type": "file_type",
+                "file_format": "file_format", "output_type": "output_type",
+                "assembly": "assembly", "md5sum": "md5sum",
+                "file_status": "status", "file_size_bytes": "file_size",
+                "submitted_file_name": "submitted_file_name"}
+
+    # keys of the file JSON that ExpFileMetadata._parseJson reads; the
+    # rest (derived_from, quality_metrics...) is dropped until built
+    ParsedKeys = ("@id", "accession", "href", "file_type", "file_format",
+                  "output_type", "date_created", "md5sum", "status", "file_size",
+                  "assembly", "submitted_file_name", "biological_replicates",
+                  "technical_replicates")
+    InternedKeys = frozenset(["file_type", "file_format", "output_type", "status",
+                              "assembly"])
+
+    def __init__(self, expID, jsons=None, files=None):
+        # jsons[i] is built into files[i] when first needed; either list may
+        # be left out, or hold None where the other has the entry
+        self.expID = expID
+        n = len(jsons if jsons is not None else files or [])
+        self._jsons = [LazyFileList.slim(j) for j in jsons] if jsons is not None \
+            else [None] * n
+        self._files = list(files) if files is not None else [None] * n
+
+    @staticmethod
+    def slim(j):
+        # only what building the ExpFile, JsonKeys and JsonDerived read
+        if j is None:
+            return None
+        ret = {}
+        for k in LazyFileList.ParsedKeys:
+            if k in j:
+                ret[k] = intern(j[k]) if k in LazyFileList.InternedKeys else j[k]
+        if "replicate" in j:
+            r = j["replicate"]
+            ret["replicate"] = {
+                "biological_replicate_number": r["biological_replicate_number"],
+                "technical_replicate_number": r["technical_replicate_number"]}
+        return ret
+
+    def entries(self):
+        # (json, ExpFile) per file, the ExpFile None until built
+        return list(zip(self._jsons, self._files))
+
+    def _get(self, i):
+        f = self._files[i]
+        if f is None:
+            j = self._jsons[i]
+            f = ExpFile.fromJson(self.expID, j["accession"], j)
+            self._files[i] = f
+            self._jsons[i] = None
+        return f
+
+    def __len__(self):
+        return len(self._files)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._get(x) for x in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if i < 0 or i >= len(self):
+            raise IndexError("file index out of range")
+        return self._get(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._get(i)
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def iterUnbuilt(self):
+        # every ExpFile; those not built yet are built for the caller only,
+        # and stay lazy here
+        for j, f in zip(self._jsons, self._files):
+            yield f if f is not None else ExpFile.fromJson(self.expID, j["accession"], j)
+
+    def append(self, f):
+        self._jsons.append(None)
+        self._files.append(f)
+
+    # replicate fields, as ExpFileMetadata._parseJson derives them
+    JsonDerived = {"bio_rep": lambda j: j.get("replicate", {}).get(
+                       "biological_replicate_number", ""),
+                   "biological_replicates": lambda j: j.get("biological_replicates"),
+                   "isPooled": lambda j: len(j.get("biological_replicates", ())) > 1}
+
+    def field(self, i, k):
+        # ExpFile attribute k of file i, read off its JSON while not built
+        j = self._jsons[i]
+        if j is None:
+            return getattr(self._files[i], k, None)
+        if k in self.JsonKeys:
+            return j.get(self.JsonKeys[k], "")
+        if k in self.JsonDerived:
+            return self.JsonDerived[k](j)
+        return getattr(self._get(i), k, None)
+
+    @staticmethod
+    def _matches(v, want):
+        if isinstance(want, (list, tuple, set)):
+            return v in want
+        return v == want
+
+    def filterBy(self, **fields):
+        # ExpFiles whose attributes equal fields (a list/tuple/set value
+        # matches any of its items); only matching files get built
+        ret = []
+        for i in range(len(self)):
+            j = self._jsons[i]
+            if j is not None and all(k in self.JsonKeys for k in fields):
+                if not all(LazyFileList._matches(j.get(self.JsonKeys[k], ""), v)
+                           for k, v in fields.items()):
+                    continue
+            f = self._get(i)
+            if all(LazyFileList._matches(getattr(f, k, None), v)
+                   for k, v in fields.items()):
+                ret.append(f)
+        return ret
@@ -2,34 +2,60 @@
 
 from __future__ import print_function
 import os
+import sys
 from .files_and_paths import Dirs, Urls
 
+_interned = {}
+
+
+def intern(s):
+    '''
+    one shared copy of each of the few distinct file_type, output_type,
+    assembly, status... values, instead of one per file
+
+    >>> intern(u"bigWig" + u"") is intern(u"big" + u"Wig")
+    True
+    '''
+    if not s:
+        return s
+    try:
+        return sys.intern(s)
+    except (AttributeError, TypeError):  # py2 unicode
+        return _interned.setdefault(s, s)
+
 
 class ExpFileMetadata(object):
+    __slots__ = ("jsonUrl", "jsondata", "encodeid", "accession", "url", "fnp_raw",
+                 "href", "file_type", "file_format", "output_type", "date_created",
+                 "md5sum", "file_status", "file_size_bytes", "assembly",
+                 "submitted_file_name", "biological_replicates",
+                 "technical_replicates", "bio_rep", "tech_rep", "isPooled",
+                 "isPairedEnd", "assay_term_name")
+
     def __init__(self):
-        pass
+        # the raw JSON is not kept once parsed; see ExpFile.getJson
+        self.jsondata = None
 
     def _parseJson(self, expID, fileID, g):
         # NOTE! changes to fields during parsing could affect data import into database...
 
         self.jsonUrl = Urls.base + "/files/{fileID}/?format=json".format(fileID=fileID)
 
-        self.jsondata = g
         self.encodeid = g["@id"]
         self.accession = g["accession"]
 
         self.url = Urls.base + g["href"]
         self.fnp_raw = os.path.join(Dirs.encode_data, os.path.basename(self.url))
         self.href = g["href"]
-        self.file_type = g["file_type"]
-        self.file_format = g["file_format"]
-        self.output_type = g["output_type"]
+        self.file_type = intern(g["file_type"])
+        self.file_format = intern(g["file_format"])
+        self.output_type = intern(g["output_type"])
         self.date_created = g["date_created"]
         self.md5sum = g["md5sum"]
-        self.file_status = g["status"]
+        self.file_status = intern(g["status"])
         self.file_size_bytes = g["file_size"]
 
-        self.assembly = g.get("assembly", "")
+        self.assembly = intern(g.get("assembly", ""))
         self.submitted_file_name = g.get("submitted_file_name", "")
 
         self.biological_replicates = g.get("biological_replicates", None)
@@ -49,15 +75,15 @@ class ExpFileMetadata(object):
         self.jsonUrl = Urls.base + "/files/{fileID}/?format=json".format(fileID=self.fileID)
         self.url = Urls.base + r["file_href"]
         self.fnp_raw = os.path.join(Dirs.encode_data, os.path.basename(self.url))
-        self.file_type = r["file_type"]
-        self.file_format = r["file_format"]
-        self.output_type = r["file_output_type"]
+        self.file_type = intern(r["file_type"])
+        self.file_format = intern(r["file_format"])
+        self.output_type = intern(r["file_output_type"])
         self.file_size_bytes = r["file_size_bytes"]
         self.md5sum = r["file_md5sum"]
-        self.file_status = r["file_status"]
+        self.file_status = intern(r["file_status"])
         self.bio_rep = r["file_bio_rep"]
         self.tech_rep = r["file_tech_rep"]
-        self.assembly = r["file_assembly"]
+        self.assembly = intern(r["file_assembly"])
         self.submitted_file_name = r["submitted_file_name"]
         self.isPooled = r["file_ispooled"]
         self.isPairedEnd = True if "run_type" in r and r["run_type"] == "paired-ended" else False
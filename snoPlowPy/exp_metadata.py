@@ -2,14 +2,25 @@
 
 from __future__ import print_function
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 from .utils import Utils
-from .exp_file import ExpFile
+from .exp_file import ExpFile, LazyFileList
+from .exp_file_metadata import intern
 
 
-class ExpMetadata:
+class ExpMetadata(object):
+    __slots__ = ("jsondata", "encodeid", "assay_term_name", "description",
+                 "isPairedEnd", "biosample_term_name", "biosample_term_id",
+                 "biosample_type", "accession", "status", "lab", "date_released",
+                 "date_released_obj", "target", "tf", "label", "age", "dbxref",
+                 "files", "unreleased_file_ids", "organ_slims")
+
+    # threads fetching unreleased files' JSON
+    UnreleasedWorkers = 8
+
     def __init__(self):
-        pass
+        self.jsondata = None
 
     def _parseJson(self, force):
         # NOTE! changes to fields during parsing could affect data import into
@@ -19,20 +30,20 @@ class ExpMetadata:
         self.encodeid = g["@id"]
 
         if "Annotation" in g["@type"]:
-            self.assay_term_name = g["annotation_type"]
+            self.assay_term_name = intern(g["annotation_type"])
         else:
-            self.assay_term_name = g["assay_term_name"]
+            self.assay_term_name = intern(g["assay_term_name"])
 
         self.description = g["description"]
         self.isPairedEnd = True if "run_type" in g and g["run_type"] == "paired-ended" else False
 
         self.biosample_term_name = Utils.getStringFromListOrString(g["biosample_term_name"])
         self.biosample_term_id = Utils.getStringFromListOrString(g["biosample_term_id"])
-        self.biosample_type = Utils.getStringFromListOrString(g["biosample_type"])
+        self.biosample_type = intern(Utils.getStringFromListOrString(g["biosample_type"]))
 
         self.accession = g["accession"]
-        self.status = g["status"]
-        self.lab = g["lab"]["name"]
+        self.status = intern(g["status"])
+        self.lab = intern(g["lab"]["name"])
 
         self.date_released = "UNKNOWN"
         if "date_released" in g:
@@ -64,23 +75,24 @@ class ExpMetadata:
         else:
             self.dbxref = []
 
-        self.files = []
-        for j in g["files"]:
-            ef = ExpFile.fromJson(self.accession, j["accession"], j)
-            self.files.append(ef)
+        # ExpFiles are built when first used
+        self.files = LazyFileList(self.accession, g["files"])
 
     def unreleasedFiles(self, force):
-        g = self.jsondata
+        g = self.getExpJson()
         revokedFiles = set([f["accession"] for f in g["revoked_files"]])
         originalFiles = set([x.split('/')[2] for x in g["original_files"]]).difference(revokedFiles)
         self.unreleased_file_ids = originalFiles.difference(set([f["accession"]
                                                                  for f in g["files"]]))
 
-        files = []
-        for fileID in self.unreleased_file_ids:
-            ef = ExpFile.fromJsonFile(self.accession, fileID, force)
-            files.append(ef)
-        return files
+        # one round trip each, so fetched (and cached) concurrently
+        fileIDs = sorted(self.unreleased_file_ids)
+        if not fileIDs:
+            return []
+        with ThreadPoolExecutor(min(self.UnreleasedWorkers, len(fileIDs))) as pool:
+            return list(pool.map(lambda fileID: ExpFile.fromJsonFile(self.accession,
+                                                                     fileID, force),
+                                 fileIDs))
 
     def _parseWS(self, rows):
         r = rows[0][0]  # one row per file, so just grab info from first file
@@ -100,4 +112,6 @@ class ExpMetadata:
         if "organ_slims" in r:
             self.organ_slims = r["organ_slims"]
 
-        self.files = [ExpFile.fromWebservice(self.encodeID, e[0]) for e in rows]
+        self.files = LazyFileList(self.encodeID,
+                                  files=[ExpFile.fromWebservice(self.encodeID, e[0])
+                                         for e in rows])
@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+
+from __future__ import print_function
+import json
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+
+class FastJson:
+    # JSON parsing through orjson when it is installed, else the stdlib;
+    # set Backend to "json" to force the stdlib
+    Backend = "orjson" if orjson else "json"
+
+    @staticmethod
+    def loads(s):
+        '''
+        >>> FastJson.loads('{"a": [1, 2]}') == {"a": [1, 2]}
+        True
+        >>> FastJson.loads(b'{"a": [1, 2]}') == {"a": [1, 2]}
+        True
+        '''
+        if "orjson" == FastJson.Backend:
+            return orjson.loads(s)
+        if isinstance(s, bytes):
+            s = s.decode("utf-8")
+        return json.loads(s)
+
+    @staticmethod
+    def loadFile(fnp):
+        with open(fnp, "rb") as f:
+            return FastJson.loads(f.read())
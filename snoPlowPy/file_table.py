@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+
+from __future__ import print_function
+import array
+import numpy as np
+
+from .exp import Exp
+
+
+class Categorical(object):
+    # a column of few distinct values: int32 codes into categories
+    def __init__(self, codes, categories):
+        self.codes = np.asarray(codes, dtype=np.int32)
+        self.categories = list(categories)
+        self._index = {c: i for i, c in enumerate(self.categories)}
+
+    @classmethod
+    def fromValues(cls, values):
+        index = {}
+        codes = [index.setdefault(v, len(index)) for v in values]
+        return cls(codes, sorted(index, key=index.get))
+
+    def __len__(self):
+        return len(self.codes)
+
+    def values(self):
+        return np.array(self.categories + [None], dtype=object)[self.codes]
+
+    def eq(self, value):
+        if value not in self._index:
+            return np.zeros(len(self.codes), dtype=bool)
+        return self.codes == self._index[value]
+
+    def isin(self, values):
+        return np.isin(self.codes, [self._index[v] for v in values if v in self._index])
+
+    def take(self, idx):
+        return Categorical(self.codes[idx], self.categories)
+
+
+class FileTable(object):
+    '''
+    every file of many experiments as columns (categorical codes for the
+    repetitive fields), for vectorized selection instead of
+    filter(lambda x: ...) over ExpFile objects
+
+    >>> t = FileTable.fromRows([
+    ...     {"exp_accession": "E1", "accession": "F1", "file_type": "bigWig",
+    ...      "output_type": "signal", "assembly": "hg19"},
+    ...     {"exp_accession": "E1", "accession": "F2", "file_type": "bam",
+    ...      "assembly": "hg19"},
+    ...     {"exp_accession": "E2", "accession": "F3", "file_type": "bigWig",
+    ...      "output_type": "fold change over control", "assembly": "GRCh38"}])
+    >>> list(t.fileIDs(t.isBigWig() & t.eq(assembly="hg19")))
+    ['F1']
+    >>> t.expAccessions(t.isBigWig())
+    ['E1', 'E2']
+    >>> len(t.select(t.isBam() | t.isFoldChange()))
+    2
+    '''
+    Categoricals = ["assay_term_name", "biosample_type", "label", "file_type",
+                    "file_format", "output_type", "assembly", "file_status",
+                    "bio_rep", "tech_rep"]
+    Strings = ["exp_accession", "accession"]
+
+    # ExpFile.is* predicates: name -> (column, value or list of values)
+    Predicates = {"isPeaks": ("output_type", "peaks"),
+                  "isReplicatedPeaks": ("output_type", "replicated peaks"),
+                  "isBedNarrowPeak": ("file_type", "bed narrowPeak"),
+                  "isBedBroadPeak": ("file_type", "bed broadPeak"),
+                  "isIDRoptimal": ("output_type", "optimal idr thresholded peaks"),
+                  "isIDR": ("output_type", "optimal idr thresholded peaks"),
+                  "isBed": ("file_format", "bed"),
+                  "isBigBed": ("file_format", "bigBed"),
+                  "isBam": ("file_type", "bam"),
+                  "isGtf": ("file_format", "gtf"),
+                  "isHdf5": ("file_format", "hdf5"),
+                  "isBigWig": ("file_type", "bigWig"),
+                  "isSignal": ("output_type", "signal"),
+                  "isRawSignal": ("output_type", "raw signal"),
+                  "isHotSpot": ("output_type", "hotspots"),
+                  "isFoldChange": ("output_type", "fold change over control"),
+                  "isFastqOrFasta": ("file_type", ["fasta", "fastq"]),
+                  "isTAD": ("output_type", "topologically associated domains"),
+                  "isTSV": ("file_type", "tsv")}
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.columns["accession"])
+
+    def __getitem__(self, name):
+        c = self.columns[name]
+        return c.values() if isinstance(c, Categorical) else c
+
+    @classmethod
+    def fromRows(cls, rows):
+        # one pass over rows, keeping no row: only the growing columns, as
+        # codes plus each categorical's index of distinct values
+        indexes = {k: {} for k in cls.Categoricals}
+        codes = {k: array.array("i") for k in cls.Categoricals}
+        strings = {k: [] for k in cls.Strings}
+        sizes = array.array("q")
+        pooled = array.array("b")
+        for r in rows:
+            for k in cls.Categoricals:
+                index = indexes[k]
+                codes[k].append(index.setdefault(r.get(k, ""), len(index)))
+            for k in cls.Strings:
+                strings[k].append(r.get(k, ""))
+            sizes.append(r.get("file_size") or 0)
+            pooled.append(bool(r.get("isPooled")))
+        columns = {}
+        for k in cls.Categoricals:
+            columns[k] = Categorical(codes[k], sorted(indexes[k], key=indexes[k].get))
+        for k in cls.Strings:
+            columns[k] = np.array(strings[k], dtype=object)
+        columns["file_size"] = np.array(sizes, dtype=np.int64)
+        columns["isPooled"] = np.array(pooled, dtype=bool)
+        return cls(columns)
+
+    @staticmethod
+    def rows(exps):
+        for exp in exps:
+            for f in exp.files:
+                yield {"exp_accession": exp.encodeID, "accession": f.fileID,
+                       "assay_term_name": exp.assay_term_name,
+                       "biosample_type": exp.biosample_type, "label": exp.label,
+                       "file_type": f.file_type, "file_format": f.file_format,
+                       "output_type": f.output_type, "assembly": f.assembly,
+                       "file_status": f.file_status, "bio_rep": str(f.bio_rep),
+                       "tech_rep": str(f.tech_rep), "file_size": f.file_size_bytes,
+                       "isPooled": f.isPooled}
+
+    @classmethod
+    def fromExps(cls, exps):
+        return cls.fromRows(FileTable.rows(exps))
+
+    @classmethod
+    def fromAccessions(cls, accessionIDs):
+        # from the experiments' cached JSON, one experiment in memory at a time
+        return cls.fromExps(Exp.fromJsonFile(a) for a in accessionIDs)
+
+    def eq(self, **fields):
+        # rows where every field equals its value (a list matches any)
+        mask = np.ones(len(self), dtype=bool)
+        for k, v in fields.items():
+            c = self.columns[k]
+            if isinstance(c, Categorical):
+                m = c.isin(v) if isinstance(v, (list, tuple, set)) else c.eq(v)
+            elif isinstance(v, (list, tuple, set)):
+                m = np.isin(c, list(v))
+            else:
+                m = c == v
+            mask &= m
+        return mask
+
+    def select(self, mask):
+        idx = np.flatnonzero(mask)
+        return FileTable({k: c.take(idx) if isinstance(c, Categorical) else c[idx]
+                          for k, c in self.columns.items()})
+
+    def fileIDs(self, mask=None):
+        c = self.columns["accession"]
+        return c if mask is None else c[mask]
+
+    def expAccessions(self, mask=None):
+        # distinct experiments with a row in mask, sorted
+        c = self.columns["exp_accession"]
+        return sorted(set(c if mask is None else c[mask]))
+
+    def totalBytes(self, mask=None):
+        c = self.columns["file_size"]
+        return int((c if mask is None else c[mask]).sum())
+
+    def save(self, fnp):
+        arrays = {}
+        for k, c in self.columns.items():
+            if isinstance(c, Categorical):
+                arrays[k + ".codes"] = c.codes
+                arrays[k + ".categories"] = np.array(c.categories, dtype=str)
+            elif c.dtype == object:
+                arrays[k] = c.astype(str)
+            else:
+                arrays[k] = c
+        np.savez_compressed(fnp, **arrays)
+
+    @classmethod
+    def load(cls, fnp):
+        columns = {}
+        with np.load(fnp) as z:
+            for k in z.files:
+                if k.endswith(".codes"):
+                    name = k[:-len(".codes")]
+                    columns[name] = Categorical(z[k], [str(c) for c in
+                                                       z[name + ".categories"]])
+                elif not k.endswith(".categories"):
+                    a = z[k]
+                    columns[k] = a.astype(object) if a.dtype.kind == "U" else a
+        return cls(columns)
+
+
+def _predicate(name, column, value):
+    def fn(self):
+        if isinstance(value, list):
+            return self.columns[column].isin(value)
+        return self.columns[column].eq(value)
+    fn.__name__ = name
+    fn.__doc__ = "mask of the rows where ExpFile.%s() holds" % name
+    return fn
+
+
+for _name, (_column, _value) in FileTable.Predicates.items():
+    setattr(FileTable, _name, _predicate(_name, _column, _value))
@@ -6,7 +6,8 @@ from .global_config import GlobalConfig
 
 
 def FindMetadataBaseDir():
-    dirs = GlobalConfig.metadataDirs
+    # METADATA_BASEDIR as set when first needed (see lazy), not at import
+    dirs = [os.getenv("METADATA_BASEDIR")] + GlobalConfig.metadataDirs
     return BaseDirFromList(dirs, "ENCODE metadata", "METADATA_BASEDIR")
 
 
@@ -35,45 +36,62 @@ def BaseDirFromList(dirs, dirname, envsearched, exit_on_failure=True):
     return "/tmp"
 
 
-class Dirs:
-    metadata_base = FindMetadataBaseDir()
-    jobmonitor_base = FindJobmonitorBaseDir()
-    wenglab_base = FindRepositoryDir()
-    wenglab_metadata = os.path.join(wenglab_base, "metadata")
-    wenglab_encyclopedia = os.path.join(wenglab_base, "encyclopedia")
-
-    encode_base = os.path.join(metadata_base, "encode")
-    encode_data = os.path.join(encode_base, "data")
-    encode_json = os.path.join(encode_base, "json")
-    encode_experiment_json = os.path.join(encode_json, "exps")
-    encode_project_json = os.path.join(encode_json, "project")
-    encode_dataset_json = os.path.join(encode_json, "datasets")
-    encode_validation_data = os.path.join(metadata_base, "tools/ENCODE/validation/encValData")
-    mean_data = os.path.join(encode_base, "mean")
-
-    roadmap_base = os.path.join(metadata_base, "roadmap", "data", "consolidated")
-
-    tools = os.path.join(metadata_base, "tools")
-    genomes = os.path.join(metadata_base, "genome")
-    gencode_m8 = os.path.join(genomes, "gencode.m8")
-
-    encyclopedia = os.path.join(metadata_base, "encyclopedia")
-    dbsnps = os.path.join(genomes, "dbsnps")
+class lazy(object):
+    # class attribute computed by fn() on first access, then stored on the
+    # class in place of this descriptor, so that importing this module does
+    # not probe any directory or file
+    def __init__(self, fn):
+        self.fn = fn
+
+    def __get__(self, obj, cls):
+        value = self.fn()
+        for c in cls.__mro__:
+            for k, v in list(c.__dict__.items()):
+                if v is self:
+                    setattr(c, k, value)
+        return value
+
+
+class Dirs(object):
+    metadata_base = lazy(FindMetadataBaseDir)
+    jobmonitor_base = lazy(FindJobmonitorBaseDir)
+    wenglab_base = lazy(FindRepositoryDir)
+    wenglab_metadata = lazy(lambda: os.path.join(Dirs.wenglab_base, "metadata"))
+    wenglab_encyclopedia = lazy(lambda: os.path.join(Dirs.wenglab_base, "encyclopedia"))
+
+    encode_base = lazy(lambda: os.path.join(Dirs.metadata_base, "encode"))
+    encode_data = lazy(lambda: os.path.join(Dirs.encode_base, "data"))
+    encode_json = lazy(lambda: os.path.join(Dirs.encode_base, "json"))
+    encode_experiment_json = lazy(lambda: os.path.join(Dirs.encode_json, "exps"))
+    encode_project_json = lazy(lambda: os.path.join(Dirs.encode_json, "project"))
+    encode_dataset_json = lazy(lambda: os.path.join(Dirs.encode_json, "datasets"))
+    encode_validation_data = lazy(lambda: os.path.join(Dirs.metadata_base,
+                                                       "tools/ENCODE/validation/encValData"))
+    mean_data = lazy(lambda: os.path.join(Dirs.encode_base, "mean"))
+
+    roadmap_base = lazy(lambda: os.path.join(Dirs.metadata_base, "roadmap", "data", "consolidated"))
+
+    tools = lazy(lambda: os.path.join(Dirs.metadata_base, "tools"))
+    genomes = lazy(lambda: os.path.join(Dirs.metadata_base, "genome"))
+    gencode_m8 = lazy(lambda: os.path.join(Dirs.genomes, "gencode.m8"))
+
+    encyclopedia = lazy(lambda: os.path.join(Dirs.metadata_base, "encyclopedia"))
+    dbsnps = lazy(lambda: os.path.join(Dirs.genomes, "dbsnps"))
 
     enhancerTracksBase = os.path.join("Enhancer-Prediction-Tracks", "March-2016")
-    enhancerTracks = os.path.join(encyclopedia,
-                                  enhancerTracksBase)
+    enhancerTracks = lazy(lambda: os.path.join(Dirs.encyclopedia,
+                                               Dirs.enhancerTracksBase))
     promoterTracksBase = os.path.join("Promoter-Prediction-Tracks")
-    promoterTracks = os.path.join(encyclopedia,
-                                  promoterTracksBase)
+    promoterTracks = lazy(lambda: os.path.join(Dirs.encyclopedia,
+                                               Dirs.promoterTracksBase))
     targetGeneTracksBase = os.path.join("Target-Gene-Prediction-Tracks",
                                         "convert")
-    targetGeneTracks = os.path.join(encyclopedia,
-                                    targetGeneTracksBase)
+    targetGeneTracks = lazy(lambda: os.path.join(Dirs.encyclopedia,
+                                                 Dirs.targetGeneTracksBase))
 
-    job_output_base = os.path.join(jobmonitor_base, "joboutput")
+    job_output_base = lazy(lambda: os.path.join(Dirs.jobmonitor_base, "joboutput"))
 
-    liftOverChainFiles = os.path.join(tools, "ucsc.liftOver")
+    liftOverChainFiles = lazy(lambda: os.path.join(Dirs.tools, "ucsc.liftOver"))
 
     @staticmethod
     def ToolsFnp(fn):
@@ -99,35 +117,35 @@ class Dirs:
         return fnp
 
 
-class Genome:
-    hg19_chr_lengths = Dirs.GenomeFnp("hg19.chromInfo")
-    hg19_2bit = Dirs.GenomeFnp("hg19.2bit")
-    hg38_chr_lengths = Dirs.GenomeFnp("hg38.chrom.sizes")
-    hg38_2bit = Dirs.GenomeFnp("hg38.2bit")
-    GRCh38_chr_lengths = Dirs.GenomeFnp("GRCh38.chrom.sizes")
-    GRCh38_2bit = Dirs.GenomeFnp("hg38.2bit")
-    mm9_chr_lengths = Dirs.GenomeFnp("mm9.chromInfo")
-    mm9_2bit = Dirs.GenomeFnp("mm9.2bit")
-    mm10_chr_lengths = Dirs.GenomeFnp("mm10.chromInfo")
-    mm10_minimal_chr_lengths = Dirs.GenomeFnp("mm10-minimal.chromInfo")
-    mm10_2bit = Dirs.GenomeFnp("mm10.2bit")
+class Genome(object):
+    hg19_chr_lengths = lazy(lambda: Dirs.GenomeFnp("hg19.chromInfo"))
+    hg19_2bit = lazy(lambda: Dirs.GenomeFnp("hg19.2bit"))
+    hg38_chr_lengths = lazy(lambda: Dirs.GenomeFnp("hg38.chrom.sizes"))
+    hg38_2bit = lazy(lambda: Dirs.GenomeFnp("hg38.2bit"))
+    GRCh38_chr_lengths = lazy(lambda: Dirs.GenomeFnp("GRCh38.chrom.sizes"))
+    GRCh38_2bit = lazy(lambda: Dirs.GenomeFnp("hg38.2bit"))
+    mm9_chr_lengths = lazy(lambda: Dirs.GenomeFnp("mm9.chromInfo"))
+    mm9_2bit = lazy(lambda: Dirs.GenomeFnp("mm9.2bit"))
+    mm10_chr_lengths = lazy(lambda: Dirs.GenomeFnp("mm10.chromInfo"))
+    mm10_minimal_chr_lengths = lazy(lambda: Dirs.GenomeFnp("mm10-minimal.chromInfo"))
+    mm10_2bit = lazy(lambda: Dirs.GenomeFnp("mm10.2bit"))
 
-    human_gencode_tss = Dirs.GenomeFnp("gencode.v19.annotation.tss.bed")
-    mouse_gencode_m1_tss = Dirs.GenomeFnp("gencode.vM1.annotation.tss.bed")
-    mouse_gencode_m8_tss = Dirs.GenomeFnp("gencode.m8.annotation.tss.bed")
+    human_gencode_tss = lazy(lambda: Dirs.GenomeFnp("gencode.v19.annotation.tss.bed"))
+    mouse_gencode_m1_tss = lazy(lambda: Dirs.GenomeFnp("gencode.vM1.annotation.tss.bed"))
+    mouse_gencode_m8_tss = lazy(lambda: Dirs.GenomeFnp("gencode.m8.annotation.tss.bed"))
 
     mouse_gencode_m8_gtf_url = ("ftp://ftp.sanger.ac.uk/pub/gencode/" +
                                 "Gencode_mouse/release_M8/gencode.vM8.annotation.gtf.gz")
     mouse_gencode_m8_gff_url = ("ftp://ftp.sanger.ac.uk/pub/gencode/" +
                                 "Gencode_mouse/release_M8/gencode.vM8.annotation.gff3.gz")
 
-    hg19_idr_blacklist = Dirs.GenomeFnp("blacklist/hg19/" +
-                                        "wgEncodeDacMapabilityConsensusExcludable.bed")
-    mm9_idr_blacklist = Dirs.GenomeFnp("blacklist/mm9/mm9-blacklist.bed")
-    mm10_idr_blacklist = Dirs.GenomeFnp("blacklist/mm10/mm10-blacklist.bed")
+    hg19_idr_blacklist = lazy(lambda: Dirs.GenomeFnp(
+        "blacklist/hg19/wgEncodeDacMapabilityConsensusExcludable.bed"))
+    mm9_idr_blacklist = lazy(lambda: Dirs.GenomeFnp("blacklist/mm9/mm9-blacklist.bed"))
+    mm10_idr_blacklist = lazy(lambda: Dirs.GenomeFnp("blacklist/mm10/mm10-blacklist.bed"))
 
-    hg19_mm10_liftOver_chain = Dirs.GenomeFnp("hg19ToMm10.over.chain.gz")
-    mm9_mm10_liftOver_chain = Dirs.GenomeFnp("mm9ToMm10.over.chain.gz")
+    hg19_mm10_liftOver_chain = lazy(lambda: Dirs.GenomeFnp("hg19ToMm10.over.chain.gz"))
+    mm9_mm10_liftOver_chain = lazy(lambda: Dirs.GenomeFnp("mm9ToMm10.over.chain.gz"))
 
     @staticmethod
     def ChrLenByAssembly(a):
@@ -164,36 +182,36 @@ class Genome:
         return files[a]
 
 
-class Tools:
-    ASdnaseTrack = Dirs.ToolsFnp("ucsc.v287/as/dnase.track.as")
-    CLIPper = Dirs.ToolsFnp("clipper/bin/clipper")
-    bedClip = Dirs.ToolsFnp("ucsc.v287/bedClip")
-    bedGraphToBigWig = Dirs.ToolsFnp("ucsc.v287/bedGraphToBigWig")
-    bedToBigBed = Dirs.ToolsFnp("ucsc.v287/bedToBigBed")
+class Tools(object):
+    ASdnaseTrack = lazy(lambda: Dirs.ToolsFnp("ucsc.v287/as/dnase.track.as"))
+    CLIPper = lazy(lambda: Dirs.ToolsFnp("clipper/bin/clipper"))
+    bedClip = lazy(lambda: Dirs.ToolsFnp("ucsc.v287/bedClip"))
+    bedGraphToBigWig = lazy(lambda: Dirs.ToolsFnp("ucsc.v287/bedGraphToBigWig"))
+    bedToBigBed = lazy(lambda: Dirs.ToolsFnp("ucsc.v287/bedToBigBed"))
     bedtools = "bedtools"
-    bigWigAverageOverBed = Dirs.ToolsFnp("ucsc.v287/bigWigAverageOverBed")
-    bigWigToBedGraph = Dirs.ToolsFnp("ucsc.v287/bigWigToBedGraph")
-    ceqlogo = Dirs.ToolsFnp("meme_4.10.2/bin/ceqlogo")
-    dfilter = Dirs.ToolsFnp("DFilter1.6/run_dfilter.sh")
-    fastaCenter = Dirs.ToolsFnp("meme_4.10.2/bin/fasta-center")
-    fimo = Dirs.ToolsFnp("meme_4.10.2/bin/fimo")
-    headRest = os.path.join(Dirs.ToolsFnp("ucsc.v287"), "headRest")
-    liftOver = os.path.join(Dirs.ToolsFnp("ucsc.v287"), "liftOver")
-    meme = Dirs.ToolsFnp("meme_4.10.2/bin/meme")
+    bigWigAverageOverBed = lazy(lambda: Dirs.ToolsFnp("ucsc.v287/bigWigAverageOverBed"))
+    bigWigToBedGraph = lazy(lambda: Dirs.ToolsFnp("ucsc.v287/bigWigToBedGraph"))
+    ceqlogo = lazy(lambda: Dirs.ToolsFnp("meme_4.10.2/bin/ceqlogo"))
+    dfilter = lazy(lambda: Dirs.ToolsFnp("DFilter1.6/run_dfilter.sh"))
+    fastaCenter = lazy(lambda: Dirs.ToolsFnp("meme_4.10.2/bin/fasta-center"))
+    fimo = lazy(lambda: Dirs.ToolsFnp("meme_4.10.2/bin/fimo"))
+    headRest = lazy(lambda: os.path.join(Dirs.ToolsFnp("ucsc.v287"), "headRest"))
+    liftOver = lazy(lambda: os.path.join(Dirs.ToolsFnp("ucsc.v287"), "liftOver"))
+    meme = lazy(lambda: Dirs.ToolsFnp("meme_4.10.2/bin/meme"))
     # randomLines = os.path.join(Dirs.ToolsFnp("ucsc.v287"), "randomLines")
-    randomLines = Dirs.ToolsFnp("randomLines")
-    tomtom = Dirs.ToolsFnp("meme_4.10.2/bin/tomtom")
-    twoBitToFa = Dirs.ToolsFnp("ucsc.v287/twoBitToFa")
-    validateFiles = Dirs.ToolsFnp("ENCODE/validation/validateFiles")
-    wigToBigWig = Dirs.ToolsFnp("ucsc.v287/wigToBigWig")
-    wiggleTools = Dirs.ToolsFnp("wiggletools.static.git.7579e66")
+    randomLines = lazy(lambda: Dirs.ToolsFnp("randomLines"))
+    tomtom = lazy(lambda: Dirs.ToolsFnp("meme_4.10.2/bin/tomtom"))
+    twoBitToFa = lazy(lambda: Dirs.ToolsFnp("ucsc.v287/twoBitToFa"))
+    validateFiles = lazy(lambda: Dirs.ToolsFnp("ENCODE/validation/validateFiles"))
+    wigToBigWig = lazy(lambda: Dirs.ToolsFnp("ucsc.v287/wigToBigWig"))
+    wiggleTools = lazy(lambda: Dirs.ToolsFnp("wiggletools.static.git.7579e66"))
 
 
-class Urls:
+class Urls(object):
     base = "https://www.encodeproject.org"
 
 
-class Webservice:
+class Webservice(object):
     urlBase = "http://bib7.umassmed.edu/ws/metadata/"
     jobmonitorBase = "http://bib7.umassmed.edu/ws/job_monitor/"
     localhostJMBase = "http://127.0.0.1:9191/job_monitor/"
@@ -240,14 +258,14 @@ class Webservice:
                             if localhost else Webservice.jobmonitorBase, uri)
 
 
-class AllHumanDataset:
+class AllHumanDataset(object):
     url = (Urls.base + "/search/?type=Experiment" +
            "&replicates.library.biosample.donor.organism.scientific_name=Homo" +
            "+sapiens&limit=all&format=json")
-    jsonFnp = os.path.join(Dirs.encode_json, "datasets", "all_human.json")
+    jsonFnp = lazy(lambda: os.path.join(Dirs.encode_json, "datasets", "all_human.json"))
     species = "human"
-    chr_lengths = Genome.hg19_chr_lengths
-    twoBit = Genome.hg19_2bit
+    chr_lengths = lazy(lambda: Genome.hg19_chr_lengths)
+    twoBit = lazy(lambda: Genome.hg19_2bit)
     genome = "hg19"
     assemblies = ["hg19", "GRCh38"]
     webserviceAll = os.path.join(Webservice.urlBase, "encode/all_human/")
@@ -263,34 +281,34 @@ class AllHumanDataset:
                                                   "encode/biosample_term_name/")
 
 
-class RoadmapConsolidatedDataset:
+class RoadmapConsolidatedDataset(object):
     url = (Urls.base + "/search/?type=ReferenceEpigenome" +
            "&organism.scientific_name=Homo+sapiens&lab.title=Anshul" +
            "+Kundaje%2C+Stanford&limit=all&format=json")
-    jsonFnp = os.path.join(Dirs.encode_json, "datasets", "roadmap.consolidated.json")
+    jsonFnp = lazy(lambda: os.path.join(Dirs.encode_json, "datasets", "roadmap.consolidated.json"))
     species = "human"
-    chr_lengths = Genome.hg19_chr_lengths
-    twoBit = Genome.hg19_2bit
+    chr_lengths = lazy(lambda: Genome.hg19_chr_lengths)
+    twoBit = lazy(lambda: Genome.hg19_2bit)
     genome = "hg19"
     assemblies = ["hg19", "GRCh38"]
 
 
-class RoadmapDataset:
+class RoadmapDataset(object):
     url = (Urls.base + "/search/?searchTerm=roadmap&type=Experiment" +
            "&award.project=Roadmap&limit=all&format=json")
-    jsonFnp = os.path.join(Dirs.encode_json, "datasets", "roadmap.json")
+    jsonFnp = lazy(lambda: os.path.join(Dirs.encode_json, "datasets", "roadmap.json"))
     species = "human"
-    chr_lengths = Genome.hg19_chr_lengths
-    twoBit = Genome.hg19_2bit
+    chr_lengths = lazy(lambda: Genome.hg19_chr_lengths)
+    twoBit = lazy(lambda: Genome.hg19_2bit)
     genome = "hg19"
     assemblies = ["hg19", "GRCh38"]
 
 
-class AllMouseDataset:
+class AllMouseDataset(object):
     url = (Urls.base + "/search/?type=experiment" +
            "&replicates.library.biosample.donor.organism.scientific_name=Mus%20musculus" +
            "&limit=all&format=json")
-    jsonFnp = os.path.join(Dirs.encode_json, "datasets", "all_mouse.json")
+    jsonFnp = lazy(lambda: os.path.join(Dirs.encode_json, "datasets", "all_mouse.json"))
     species = "mouse"
     assemblies = ["mm9", "mm10-minimal", "mm10"]
     webserviceAll = os.path.join(Webservice.urlBase, "encode/all_mouse/")
@@ -305,49 +323,49 @@ class AllMouseDataset:
     webservice_eCLIP = os.path.join(Webservice.urlBase, "encode/all_mouse/eCLIP")
 
 
-class smallRNAdataset:
+class smallRNAdataset(object):
     url = ("https://www.encodeproject.org/search/?type=experiment" +
            "&assay_term_name=RNA-seq" +
            "&replicates.library.biosample.donor.organism.scientific_name=Homo+sapiens" +
            "&replicates.library.size_range=%3C200&status=released&limit=all" +
            "&files.file_type=fastq&files.read_length=101&format=json")
-    jsonFnp = os.path.join(Dirs.encode_json, "datasets", "junko.smallRNA.json")
+    jsonFnp = lazy(lambda: os.path.join(Dirs.encode_json, "datasets", "junko.smallRNA.json"))
     species = "NA"
 
 
-class cricketDataset:
+class cricketDataset(object):
     url = ("https://www.encodeproject.org/search/?type=project" +
            "&lab.title=Zhiping%20Weng,%20UMass&status=released&format=json")
-    jsonFnp = os.path.join(Dirs.encode_json, "datasets", "cricket.json")
+    jsonFnp = lazy(lambda: os.path.join(Dirs.encode_json, "datasets", "cricket.json"))
     species = "NA"
 
 
-class encode3DNaseHuman:
+class encode3DNaseHuman(object):
     # this is a (authenticated) search for datasets using the "'award.rfa=ENCODE3' trick"
     # to select for ENCODE3 data only: all human ENCODE3 DNase-seq datasets from John Stam's lab.
     url = ("https://www.encodeproject.org/search/?type=experiment&award.rfa=ENCODE3" +
            "&assay_term_name=DNase-seq" +
            "&replicates.library.biosample.donor.organism.scientific_name=Homo%20sapiens" +
            "&limit=all&lab.title=John%20Stamatoyannopoulos,%20UW&format=json")
-    jsonFnp = os.path.join(Dirs.encode_json, "datasets", "encode3_human_dnase.json")
+    jsonFnp = lazy(lambda: os.path.join(Dirs.encode_json, "datasets", "encode3_human_dnase.json"))
     species = "human"
 
 
-class RoadmapFromEncode:
+class RoadmapFromEncode(object):
     url = ("https://www.encodeproject.org/search/?award.project=Roadmap" +
            "&type=experiment&limit=all&format=json")
-    jsonFnp = os.path.join(Dirs.encode_json, "datasets", "roadmap.json")
+    jsonFnp = lazy(lambda: os.path.join(Dirs.encode_json, "datasets", "roadmap.json"))
     species = "NA"
 
 
-class ENCODE3MouseForChromHMM:
+class ENCODE3MouseForChromHMM(object):
     # all histone mods for mouse as defined in listed projects.
     webserviceAll = os.path.join(Webservice.urlBase,
                                  "encode/byDataset/ENCSR215KPY/ENCSR557UVG/" +
                                  "ENCSR837UJN/ENCSR846VTS/ENCSR647ZZB/ENCSR392ERD")
 
 
-class Datasets:
+class Datasets(object):
     all_human = AllHumanDataset
     all_mouse = AllMouseDataset
     roadmap = RoadmapDataset
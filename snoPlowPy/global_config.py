@@ -9,4 +9,4 @@ class GlobalConfig:
     c = ConfigParser()
     c.read(fnp)
 
-    metadataDirs = [os.getenv("METADATA_BASEDIR")] + c.get("Paths", "metadata").split(',')
+    metadataDirs = c.get("Paths", "metadata").split(',')
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+
+from __future__ import print_function
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_tz, mktime_tz
+
+from future.moves.urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+import requests
+
+
+class TokenBucket(object):
+    # allows rate requests per second on average, in bursts of up to burst
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = burst
+        self.tokens = float(burst)
+        self.stamp = time.time()
+        self._lock = threading.Lock()
+
+    def take(self):
+        with self._lock:
+            now = time.time()
+            self.tokens = min(self.burst,
+                              self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            # reserve a token now, waiting for it if it has not accrued yet
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class RetryPolicy(object):
+    # exponential backoff with full jitter; a Retry-After header wins
+    RetryStatuses = (429, 500, 502, 503, 504)
+
+    def __init__(self, retries=5, backoff=1.0, max_backoff=120.0):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    @staticmethod
+    def retryAfter(r):
+        # seconds to wait from a Retry-After header (delta or HTTP date)
+        if r is None or not r.headers.get("Retry-After"):
+            return None
+        v = r.headers["Retry-After"].strip()
+        if v.isdigit():
+            return float(v)
+        t = parsedate_tz(v)
+        if t is None:
+            return None
+        return max(0.0, mktime_tz(t) - time.time())
+
+    def shouldRetry(self, attempt, r=None):
+        if attempt >= self.retries:
+            return False
+        return r is None or r.status_code in self.RetryStatuses
+
+    def delay(self, attempt, r=None):
+        after = RetryPolicy.retryAfter(r)
+        if after is not None:
+            return min(after, self.max_backoff)
+        return random.uniform(0, min(self.max_backoff,
+                                     self.backoff * 2 ** attempt))
+
+
+class HttpSession(object):
+    # one pooled keep-alive requests.Session per process; every Utils
+    # download/query goes through it, so QueryDCC, Exp, ExpFile and
+    # Biosample all share connections and credentials
+    PoolConnections = 16  # hosts kept in the pool
+    PoolMaxSize = 32  # connections kept per host
+    KeyFnp = os.path.expanduser('~/.encode.txt')
+    Retry = RetryPolicy()
+    RatePerHost = 10.0  # requests per second, per host, per process
+    RateBurst = 20
+
+    _lock = threading.Lock()
+    _session = None
+    _pid = None
+    _auth = None
+    _authHosts = set()  # hosts that answered 403 to an anonymous request
+    _buckets = {}
+
+    @classmethod
+    def session(cls):
+        with cls._lock:
+            # don't share sockets with a parent process after a fork
+            if cls._session is None or cls._pid != os.getpid():
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=cls.PoolConnections,
+                                      pool_maxsize=cls.PoolMaxSize)
+                s.mount("http://", adapter)
+                s.mount("https://", adapter)
+                cls._session = s
+                cls._pid = os.getpid()
+            return cls._session
+
+    @classmethod
+    def auth(cls):
+        with cls._lock:
+            if cls._auth is None:
+                if not os.path.exists(cls.KeyFnp):
+                    raise Exception("no ENCODE password file found at: " +
+                                    cls.KeyFnp)
+                with open(cls.KeyFnp) as f:
+                    toks = f.read().strip().split('\n')
+                cls._auth = HTTPBasicAuth(toks[0], toks[1])
+            return cls._auth
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            if cls._session is not None:
+                cls._session.close()
+            cls._session = None
+            cls._auth = None
+            cls._authHosts = set()
+            cls._buckets = {}
+
+    @classmethod
+    def bucket(cls, host):
+        with cls._lock:
+            if host not in cls._buckets:
+                cls._buckets[host] = TokenBucket(cls.RatePerHost, cls.RateBurst)
+            return cls._buckets[host]
+
+    @classmethod
+    def _send(cls, method, url, host, auth, **kwargs):
+        # anonymous first unless auth is asked for, with credentials on a 403;
+        # once a host has sent a 403 it gets credentials up front
+        s = cls.session()
+        if not auth and host not in cls._authHosts:
+            cls.bucket(host).take()
+            r = s.request(method, url, **kwargs)
+            if 403 != r.status_code:
+                return r
+            r.close()
+            cls._authHosts.add(host)
+        cls.bucket(host).take()
+        return s.request(method, url, auth=cls.auth(), **kwargs)
+
+    @classmethod
+    def request(cls, method, url, auth=None, transfer=None, **kwargs):
+        # rate limited per host; connection errors, 429s and 5xxs are
+        # retried per HttpSession.Retry before the caller sees them, and
+        # counted on transfer (a metrics.Transfer) if given
+        host = urlparse(url).netloc
+        attempt = 0
+        while True:
+            try:
+                r = cls._send(method, url, host, auth, **kwargs)
+            except (requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout):
+                if not cls.Retry.shouldRetry(attempt):
+                    raise
+                delay = cls.Retry.delay(attempt)
+            else:
+                if not cls.Retry.shouldRetry(attempt, r):
+                    return r
+                delay = cls.Retry.delay(attempt, r)
+                r.close()
+            attempt += 1
+            if transfer is not None:
+                transfer.retried()
+            time.sleep(delay)
+
+    @classmethod
+    def get(cls, url, auth=None, **kwargs):
+        return cls.request("GET", url, auth, **kwargs)
+
+    @classmethod
+    def head(cls, url, auth=None, **kwargs):
+        kwargs.setdefault("allow_redirects", False)
+        return cls.request("HEAD", url, auth, **kwargs)
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+
+from __future__ import print_function
+import os
+import sys
+import glob
+import time
+import zlib
+import sqlite3
+import argparse
+
+from .files_and_paths import Dirs
+from .sqlite_db import SqliteDb
+from .http_session import HttpSession
+from .fast_json import FastJson
+from .utils import Utils
+
+
+class JsonStore(SqliteDb):
+    # every cached experiment, file and biosample JSON in one sqlite file
+    # (Dirs.encode_json/store.sqlite) instead of one small file each; used
+    # by Exp, ExpFile and Biosample once it exists (see importTree)
+    Schema = ["""CREATE TABLE IF NOT EXISTS docs (
+                 kind TEXT,
+                 key TEXT,
+                 body BLOB,
+                 etag TEXT,
+                 last_modified TEXT,
+                 updated REAL,
+                 PRIMARY KEY (kind, key))"""]
+
+    Kinds = ["experiment", "file", "biosample"]
+
+    _default = (None, None)
+
+    @staticmethod
+    def defaultFnp():
+        return os.path.join(Dirs.encode_json, "store.sqlite")
+
+    @classmethod
+    def default(cls):
+        # None until the store has been created; looked up once per path
+        fnp = JsonStore.defaultFnp()
+        if cls._default[0] != fnp:
+            cls._default = (fnp, cls(fnp) if os.path.exists(fnp) else None)
+        return cls._default[1]
+
+    def getBytes(self, kind, key):
+        rows = self.read("SELECT body FROM docs WHERE kind = ? AND key = ?",
+                         (kind, key))
+        if not rows:
+            return None
+        return zlib.decompress(bytes(rows[0][0]))
+
+    def get(self, kind, key):
+        body = self.getBytes(kind, key)
+        if body is None:
+            return None
+        return FastJson.loads(body)
+
+    def has(self, kind, key):
+        return bool(self.read("SELECT 1 FROM docs WHERE kind = ? AND key = ?",
+                              (kind, key)))
+
+    def keys(self, kind):
+        return [r[0] for r in self.read("SELECT key FROM docs WHERE kind = ? ORDER BY key",
+                                        (kind,))]
+
+    @staticmethod
+    def _row(kind, key, body, etag=None, last_modified=None):
+        if not isinstance(body, bytes):
+            body = body.encode("utf-8")
+        return (kind, key, sqlite3.Binary(zlib.compress(body)), etag,
+                last_modified, time.time())
+
+    def put(self, kind, key, body, etag=None, last_modified=None):
+        self.write("""INSERT OR REPLACE INTO docs
+                      (kind, key, body, etag, last_modified, updated)
+                      VALUES (?, ?, ?, ?, ?, ?)""",
+                   JsonStore._row(kind, key, body, etag, last_modified))
+
+    def fetch(self, kind, key, url, force=False, auth=True):
+        # the stored JSON for key, first downloaded from url if missing or force
+        if not force:
+            ret = self.get(kind, key)
+            if ret is not None:
+                return ret
+        r = HttpSession.get(url, auth)
+        if 200 != r.status_code:
+            raise Exception("could not download " + url +
+                            " status_code: " + str(r.status_code))
+        self.put(kind, key, r.content, r.headers.get("ETag"),
+                 r.headers.get("Last-Modified"))
+        return FastJson.loads(r.content)
+
+    def revalidate(self, kind, key, url, auth=True, quiet=False):
+        # Utils.revalidate for a stored document; True if its body changed
+        rows = self.read("""SELECT etag, last_modified FROM docs
+                            WHERE kind = ? AND key = ?""", (kind, key))
+        headers = {}
+        if rows and rows[0][0]:
+            headers["If-None-Match"] = rows[0][0]
+        if rows and rows[0][1]:
+            headers["If-Modified-Since"] = rows[0][1]
+        r = HttpSession.get(url, auth, headers=headers)
+        if 304 == r.status_code:
+            Utils.quietPrint(quiet, "not modified", url)
+            return False
+        if 200 != r.status_code:
+            Utils.quietPrint(quiet, "could not revalidate", url,
+                             "status_code:", r.status_code)
+            return False
+        changed = r.content != self.getBytes(kind, key)
+        self.put(kind, key, r.content, r.headers.get("ETag"),
+                 r.headers.get("Last-Modified"))
+        Utils.quietPrint(quiet, "changed" if changed else "unchanged", url)
+        return changed
+
+    @staticmethod
+    def treeFiles(jsonDir):
+        # (kind, key, fnp) of every JSON in the one-file-per-object layout
+        exps = os.path.join(jsonDir, "exps")
+        for fnp in sorted(glob.glob(os.path.join(exps, "*.json"))):
+            yield "experiment", os.path.basename(fnp)[:-len(".json")], fnp
+        for fnp in sorted(glob.glob(os.path.join(exps, "*", "*.json"))):
+            expID = os.path.basename(os.path.dirname(fnp))
+            yield "file", expID + "/" + os.path.basename(fnp)[:-len(".json")], fnp
+        for fnp in sorted(glob.glob(os.path.join(jsonDir, "biosamples", "*.json"))):
+            yield "biosample", os.path.basename(fnp)[:-len(".json")], fnp
+
+    @classmethod
+    def importTree(cls, jsonDir=None, fnp=None, batch=1000, quiet=False):
+        # one-time copy of an existing JSON tree into a store, which is then
+        # used instead of the files; returns the number of documents
+        jsonDir = jsonDir or Dirs.encode_json
+        store = cls(fnp or os.path.join(jsonDir, "store.sqlite"))
+        sql = """INSERT OR REPLACE INTO docs
+                 (kind, key, body, etag, last_modified, updated)
+                 VALUES (?, ?, ?, ?, ?, ?)"""
+        rows = []
+        n = 0
+        for kind, key, jsonFnp in cls.treeFiles(jsonDir):
+            with open(jsonFnp, "rb") as f:
+                body = f.read()
+            # keep Utils.revalidate's validators, so refreshes stay conditional
+            validators = {}
+            if os.path.exists(Utils.validatorsFnp(jsonFnp)):
+                validators = FastJson.loadFile(Utils.validatorsFnp(jsonFnp))
+            rows.append(cls._row(kind, key, body, validators.get("etag"),
+                                 validators.get("last_modified")))
+            if len(rows) >= batch:
+                store.writeMany(sql, rows)
+                n += len(rows)
+                rows = []
+                Utils.quietPrint(quiet, "imported", "{:,}".format(n))
+        store.writeMany(sql, rows)
+        n += len(rows)
+        Utils.quietPrint(quiet, "imported", "{:,}".format(n), "documents into",
+                         store.fnp)
+        cls._default = (None, None)
+        return n
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="import the JSON tree into a JsonStore")
+    parser.add_argument('--json-dir', type=str, default="")
+    parser.add_argument('--store', type=str, default="")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    JsonStore.importTree(args.json_dir or None, args.store or None)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+
+from __future__ import print_function
+import io
+import json
+import codecs
+import re
+
+_ws = re.compile(r'[ \t\n\r]*')
+_decoder = json.JSONDecoder()
+_numberChars = frozenset(".eE0123456789+-")
+
+
+class _Reader(object):
+    # a growing text buffer over a file, consumed from the front
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def more(self):
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def skipWs(self):
+        while True:
+            self.pos = _ws.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf) or not self.more():
+                return
+
+    def peek(self):
+        self.skipWs()
+        if self.pos >= len(self.buf):
+            raise ValueError("unexpected end of JSON")
+        return self.buf[self.pos]
+
+    def expect(self, c):
+        if self.peek() != c:
+            raise ValueError("expected %r at %r" % (c, self.buf[self.pos:self.pos + 20]))
+        self.pos += 1
+
+    def value(self):
+        # one complete JSON value; a number ending at the end of the buffer,
+        # or cut after its "." or "e" ("1." decodes as 1), may be cut short,
+        # so read on before trusting it
+        self.skipWs()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+                if self.eof or (end < len(self.buf) and not
+                                (isinstance(obj, (int, float)) and
+                                 self.buf[end] in _numberChars)):
+                    self.pos = end
+                    return obj
+            except ValueError:
+                if self.eof:
+                    raise
+            self.more()
+
+
+class _Chunks(object):
+    # read() over an iterator of text chunks, e.g. a streamed response
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+
+    def read(self, size=-1):
+        for chunk in self.chunks:
+            if chunk:
+                return chunk
+        return ""
+
+
+def _items(r):
+    r.expect('[')
+    if ']' == r.peek():
+        r.pos += 1
+        return
+    while True:
+        yield r.value()
+        if ']' == r.peek():
+            r.pos += 1
+            return
+        r.expect(',')
+
+
+def iterArray(f, key="@graph", chunk_size=1024 * 1024):
+    '''
+    yield the items of the array under key of the top-level JSON object in
+    text file f (or of the top-level array, if key is None) one at a time,
+    without loading the whole document
+
+    >>> list(iterArray(io.StringIO(u'{"total": 2, "@graph": [{"a": 1}, 2], "x": {}}')))
+    [{'a': 1}, 2]
+    >>> list(iterArray(io.StringIO(u'{"@graph": [12345, "]"]}'), chunk_size=2))
+    [12345, ']']
+    >>> [list(iterArray(io.StringIO(u'{"n": 2.5E-3, "@graph": [1.5e10, 3]}'), chunk_size=n))
+    ...  for n in (1, 2, 4, 7, 8)] == [[1.5e10, 3]] * 5
+    True
+    >>> list(iterArray(io.StringIO(u'{"x": []}')))
+    []
+    >>> list(iterArray(io.StringIO(u'[[{"a": 1}], [{"a": 2}]]'), None, chunk_size=3))
+    [[{'a': 1}], [{'a': 2}]]
+    '''
+    r = _Reader(f, chunk_size)
+    if key is None:
+        for e in _items(r):
+            yield e
+        return
+    r.expect('{')
+    if '}' == r.peek():
+        return
+    while True:
+        k = r.value()
+        r.expect(':')
+        if k != key:
+            r.value()
+        else:
+            for e in _items(r):
+                yield e
+            return
+        if '}' == r.peek():
+            return
+        r.expect(',')
+
+
+def iterGraph(fnp, key="@graph", chunk_size=1024 * 1024):
+    # iterArray over the JSON file at fnp, e.g. a cached ENCODE search
+    with io.open(fnp, encoding="utf-8") as f:
+        for e in iterArray(f, key, chunk_size):
+            yield e
+
+
+def iterResponse(r, key="@graph", chunk_size=1024 * 1024):
+    # iterArray over the body of r, a requests response made with stream=True
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    chunks = (decoder.decode(c) for c in r.iter_content(chunk_size))
+    return iterArray(_Chunks(chunks), key, chunk_size)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+
+from __future__ import print_function
+import os
+import time
+
+from .files_and_paths import Dirs
+from .sqlite_db import SqliteDb
+
+
+class DownloadManifest(SqliteDb):
+    # record of every completed download (path, accession, md5, size,
+    # mtime), so reruns can skip the HEAD request and NFS stat per file
+    Schema = ["""CREATE TABLE IF NOT EXISTS downloads (
+                 fnp TEXT PRIMARY KEY,
+                 accession TEXT,
+                 url TEXT,
+                 md5sum TEXT,
+                 size INTEGER,
+                 mtime REAL,
+                 completed REAL)""",
+              """CREATE INDEX IF NOT EXISTS downloads_accession
+                 ON downloads (accession)"""]
+
+    _default = None
+
+    def __init__(self, fnp, timeout=60):
+        SqliteDb.__init__(self, fnp, timeout)
+        self._records = None
+
+    @classmethod
+    def default(cls):
+        if cls._default is None:
+            cls._default = cls(os.path.join(Dirs.encode_base,
+                                            "download_manifest.sqlite"))
+        return cls._default
+
+    def records(self):
+        # whole manifest, loaded once per process: one read instead of a
+        # query (and a lock on a shared filesystem) per file
+        if self._records is None:
+            rows = self.read("SELECT fnp, accession, md5sum, size, mtime FROM downloads")
+            self._records = {r[0]: r[1:] for r in rows}
+        return self._records
+
+    def get(self, fnp):
+        r = self.records().get(fnp)
+        if not r:
+            return None
+        return {"fnp": fnp, "accession": r[0], "md5sum": r[1],
+                "size": r[2], "mtime": r[3]}
+
+    def has(self, fnp, file_size_bytes=0, md5sum=None):
+        r = self.records().get(fnp)
+        if not r:
+            return False
+        if file_size_bytes and file_size_bytes > 0 and r[2] != file_size_bytes:
+            return False
+        if md5sum and r[1] and r[1] != md5sum:
+            return False
+        return True
+
+    def record(self, fnp, url=None, accession=None, md5sum=None):
+        st = os.stat(fnp)
+        self.write("""INSERT OR REPLACE INTO downloads
+                      (fnp, accession, url, md5sum, size, mtime, completed)
+                      VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                   (fnp, accession, url, md5sum, st.st_size, st.st_mtime,
+                    time.time()))
+        self.records()[fnp] = (accession, md5sum, st.st_size, st.st_mtime)
+
+    def forget(self, fnp):
+        self.write("DELETE FROM downloads WHERE fnp = ?", (fnp,))
+        self.records().pop(fnp, None)
+
+    def verify(self):
+        # drop entries whose file is gone or was changed outside the
+        # manifest; returns the paths that were dropped
+        stale = []
+        for fnp, r in list(self.records().items()):
+            if not os.path.exists(fnp):
+                stale.append(fnp)
+                continue
+            st = os.stat(fnp)
+            if st.st_size != r[2] or st.st_mtime != r[3]:
+                stale.append(fnp)
+        for fnp in stale:
+            self.forget(fnp)
+        return stale
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+
+from __future__ import print_function
+import os
+import json
+import errno
+import threading
+import time
+
+
+class Transfer(object):
+    # measurements for one Utils.download call
+    def __init__(self, url, fnp):
+        self.url = url
+        self.fnp = fnp
+        self.bytes = 0
+        self.retries = 0
+        self.ttfb = None
+        self.wall = None
+        self.cache_hit = False
+        self.ok = None
+        self._start = time.time()
+        self._lock = threading.Lock()
+
+    def addBytes(self, n):
+        with self._lock:
+            if self.ttfb is None:
+                self.ttfb = time.time() - self._start
+            self.bytes += n
+
+    def retried(self):
+        with self._lock:
+            self.retries += 1
+
+    def finish(self, ok):
+        self.wall = time.time() - self._start
+        self.ok = bool(ok)
+        DownloadMetrics.current().add(self)
+        return ok
+
+    def toDict(self):
+        return {"url": self.url, "fnp": self.fnp, "bytes": self.bytes,
+                "wall": self.wall, "ttfb": self.ttfb, "retries": self.retries,
+                "cache_hit": self.cache_hit, "ok": self.ok,
+                "time": self._start, "pid": os.getpid()}
+
+
+class DownloadMetrics(object):
+    # per-run totals of every Transfer, optionally also appended as JSON
+    # lines to jsonlFnp (shared by all worker processes of a run)
+    EnvJsonl = "SNOPLOW_METRICS_JSONL"
+    DurationBuckets = [0.1, 0.5, 1, 5, 15, 60, 300, 1800, 3600]
+
+    _current = None
+
+    def __init__(self, jsonlFnp=None):
+        self.jsonlFnp = jsonlFnp
+        self._lock = threading.Lock()
+        self.counts = {"fresh": 0, "cache_hit": 0, "failed": 0}
+        self.bytes = 0
+        self.wall = 0.0
+        self.fetchWall = 0.0
+        self.ttfb = 0.0
+        self.ttfbCount = 0
+        self.retries = 0
+        self.buckets = [0] * len(self.DurationBuckets)
+
+    @classmethod
+    def current(cls):
+        # worker processes pick up the run's JSON lines file from the env
+        if cls._current is None:
+            cls._current = cls(os.getenv(cls.EnvJsonl))
+        return cls._current
+
+    @classmethod
+    def startRun(cls, d):
+        # send this process's and its workers' transfers to d
+        try:
+            os.makedirs(d)
+        except OSError as exc:
+            if exc.errno != errno.EEXIST:
+                raise
+        jsonlFnp = os.path.join(d, "downloads." + time.strftime("%Y%m%d-%H%M%S") +
+                                ".jsonl")
+        os.environ[cls.EnvJsonl] = jsonlFnp
+        cls._current = cls(jsonlFnp)
+        return cls._current
+
+    def finishRun(self):
+        # totals over every process of the run, from the shared JSON lines,
+        # printed and written next to them as a Prometheus textfile
+        total = self
+        if self.jsonlFnp and os.path.exists(self.jsonlFnp):
+            total = DownloadMetrics.fromJsonLines(self.jsonlFnp)
+            total.writePrometheus(os.path.join(os.path.dirname(self.jsonlFnp),
+                                               "downloads.prom"))
+        total.printSummary()
+        return total
+
+    def add(self, t):
+        if isinstance(t, Transfer):
+            t = t.toDict()
+        with self._lock:
+            if not t["ok"]:
+                self.counts["failed"] += 1
+            elif t["cache_hit"]:
+                self.counts["cache_hit"] += 1
+            else:
+                self.counts["fresh"] += 1
+                self.fetchWall += t["wall"]
+                for i, b in enumerate(self.DurationBuckets):
+                    if t["wall"] <= b:
+                        self.buckets[i] += 1
+            self.bytes += t["bytes"]
+            self.wall += t["wall"] or 0
+            self.retries += t["retries"]
+            if t["ttfb"] is not None:
+                self.ttfb += t["ttfb"]
+                self.ttfbCount += 1
+            if self.jsonlFnp:
+                # one short append per line so processes don't interleave
+                with open(self.jsonlFnp, "a") as f:
+                    f.write(json.dumps(t) + "\n")
+
+    @classmethod
+    def fromJsonLines(cls, fnp):
+        ret = cls()
+        with open(fnp) as f:
+            for line in f:
+                if line.strip():
+                    ret.add(json.loads(line))
+        return ret
+
+    def summary(self):
+        return {"transfers": sum(self.counts.values()),
+                "fresh": self.counts["fresh"],
+                "cache_hits": self.counts["cache_hit"],
+                "failed": self.counts["failed"],
+                "bytes": self.bytes,
+                "wall_seconds": self.wall,
+                "retries": self.retries,
+                "mean_ttfb_seconds": (self.ttfb / self.ttfbCount
+                                      if self.ttfbCount else None),
+                "fetch_seconds": self.fetchWall,
+                "bytes_per_second": (self.bytes / self.fetchWall
+                                     if self.fetchWall else None)}
+
+    def printSummary(self):
+        s = self.summary()
+        print("downloads:", s["transfers"], "(" + str(s["fresh"]), "fetched,",
+              s["cache_hits"], "cached,", s["failed"], "failed);",
+              "{:,}".format(s["bytes"]), "bytes in",
+              "%.1f" % s["wall_seconds"], "s;", s["retries"], "retries")
+
+    def writePrometheus(self, fnp):
+        # node_exporter textfile collector format, replaced atomically
+        p = "snoplow_download_"
+        lines = ["# TYPE %stransfers_total counter" % p]
+        for k in sorted(self.counts):
+            lines.append('%stransfers_total{result="%s"} %d' % (p, k, self.counts[k]))
+        lines += ["# TYPE %sbytes_total counter" % p,
+                  "%sbytes_total %d" % (p, self.bytes),
+                  "# TYPE %sretries_total counter" % p,
+                  "%sretries_total %d" % (p, self.retries),
+                  "# TYPE %sttfb_seconds summary" % p,
+                  "%sttfb_seconds_sum %f" % (p, self.ttfb),
+                  "%sttfb_seconds_count %d" % (p, self.ttfbCount),
+                  "# TYPE %sduration_seconds histogram" % p]
+        for b, n in zip(self.DurationBuckets, self.buckets):
+            lines.append('%sduration_seconds_bucket{le="%s"} %d' % (p, b, n))
+        lines += ['%sduration_seconds_bucket{le="+Inf"} %d' % (p, self.counts["fresh"]),
+                  "%sduration_seconds_sum %f" % (p, self.fetchWall),
+                  "%sduration_seconds_count %d" % (p, self.counts["fresh"])]
+        with open(fnp + ".tmp", "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.rename(fnp + ".tmp", fnp)
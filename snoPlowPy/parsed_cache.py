@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+from __future__ import print_function
+import os
+import json
+from datetime import datetime
+
+from .exp_file import ExpFile, LazyFileList
+from .fast_json import FastJson
+
+_datetimeFormat = "%Y-%m-%dT%H:%M:%S.%f"
+
+
+class ParsedCache:
+    # an Exp's fields, and its ExpFiles', as parsed from its JSON, saved
+    # next to it (<accession>.json.parsed) and trusted only while the JSON
+    # keeps the size and mtime it had; the raw JSON is not kept, and is
+    # reloaded on demand (Exp.getExpJson, ExpFile.getJson). Saved as plain JSON, not
+    # pickled: the JSON tree is group-writable, and loading must not run
+    # anything someone else put there
+    Enabled = True
+    Version = 5
+
+    @staticmethod
+    def fnp(jsonFnp):
+        return jsonFnp + ".parsed"
+
+    @staticmethod
+    def stamp(jsonFnp):
+        st = os.stat(jsonFnp)
+        return [ParsedCache.Version, st.st_size, st.st_mtime]
+
+    @staticmethod
+    def state(obj):
+        # set slots of obj (Exp and ExpFile have no __dict__), bar the raw JSON
+        # and what is derived from the files
+        ret = {}
+        for cls in type(obj).__mro__:
+            for k in getattr(cls, "__slots__", ()):
+                if k not in ("jsondata", "files", "_fileIndex") and hasattr(obj, k):
+                    v = getattr(obj, k)
+                    if isinstance(v, datetime):  # e.g. date_released_obj
+                        v = {"datetime": v.strftime(_datetimeFormat)}
+                    ret[k] = v
+        return ret
+
+    @staticmethod
+    def restore(obj, state):
+        for k, v in state.items():
+            if isinstance(v, dict) and list(v) == ["datetime"]:
+                v = datetime.strptime(v["datetime"], _datetimeFormat)
+            setattr(obj, k, v)
+
+    @staticmethod
+    def load(exp):
+        # fill a newly constructed exp from the cache; False if none or stale
+        fnp = ParsedCache.fnp(exp.jsonFnp)
+        if not ParsedCache.Enabled or not os.path.exists(fnp):
+            return False
+        try:
+            stamp, expState, fileStates = FastJson.loadFile(fnp)
+            if stamp != ParsedCache.stamp(exp.jsonFnp):
+                return False
+            ParsedCache.restore(exp, expState)
+            files = []
+            for s in fileStates:
+                ef = ExpFile(s["expID"], s["fileID"])
+                ParsedCache.restore(ef, s)
+                files.append(ef)
+        except Exception:
+            return False  # unreadable or not ours: parsed from the JSON instead
+        exp.files = LazyFileList(exp.encodeID, files=files)
+        return True
+
+    @staticmethod
+    def save(exp):
+        if not ParsedCache.Enabled:
+            return
+        expState = ParsedCache.state(exp)
+        # every file parsed, so loading builds none from JSON; the list
+        # itself stays lazy
+        fileStates = [ParsedCache.state(f) for f in exp.files.iterUnbuilt()]
+        fnp = ParsedCache.fnp(exp.jsonFnp)
+        tmpFnp = fnp + ".%d.tmp" % os.getpid()
+        try:
+            with open(tmpFnp, "w") as f:
+                json.dump([ParsedCache.stamp(exp.jsonFnp), expState, fileStates], f,
+                          separators=(",", ":"))
+            os.rename(tmpFnp, fnp)
+        except (IOError, OSError):
+            pass  # e.g. read-only JSON dir: just parse every time
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+from __future__ import print_function
+import os
+import collections
+
+from .exp import Exp
+from .manifest import DownloadManifest
+
+
+class SyncPlanner(object):
+    # dry run of a sync: tallies what would be fetched, per assay and file
+    # type, from cached experiment JSON only (never touches the network)
+    def __init__(self, bandwidth_mb=100.0, manifest=None):
+        self.bandwidth = bandwidth_mb * 1024 * 1024  # bytes per second
+        self.manifest = manifest
+        self.rows = collections.defaultdict(lambda: [0, 0, 0])
+        self.missingExps = []
+        self.unknownSizes = 0
+        self._seen = set()
+
+    def addAccessions(self, accessionIDs, want, expFilter=None):
+        # want(expFile) and expFilter(exp) mirror the downloader's selection
+        for accessionID in accessionIDs:
+            if not Exp.hasCachedJson(accessionID):
+                self.missingExps.append(accessionID)
+                continue
+            exp = Exp.fromJsonFile(accessionID)
+            if expFilter and not expFilter(exp):
+                continue
+            for f in exp.files:
+                if want(f):
+                    self.addFile(exp, f)
+
+    def _present(self, fnp, size):
+        if self.manifest is not None and self.manifest.has(fnp, size):
+            return True
+        return os.path.exists(fnp) and os.path.getsize(fnp) == size
+
+    def addFile(self, exp, f):
+        fnp = f.fnp()
+        if fnp in self._seen:
+            return
+        self._seen.add(fnp)
+        size = f.file_size_bytes or 0
+        if not size:
+            self.unknownSizes += 1
+        row = self.rows[(exp.assay_term_name, f.file_type)]
+        row[0] += 1
+        row[1] += size
+        if size and self._present(fnp, size):
+            row[2] += size
+
+    def totals(self):
+        ret = [0, 0, 0]
+        for row in self.rows.values():
+            ret = [a + b for a, b in zip(ret, row)]
+        return ret
+
+    def seconds(self, numBytes):
+        return numBytes / self.bandwidth if self.bandwidth else None
+
+    def report(self):
+        def gb(n):
+            return "%.2f" % (n / 1024.0 ** 3)
+
+        def hours(n):
+            return "%.1f" % (self.seconds(n) / 3600.0)
+
+        print("\t".join(["assay", "file_type", "files", "total_GB",
+                         "present_GB", "to_fetch_GB", "est_hours"]))
+        for key in sorted(self.rows):
+            n, total, present = self.rows[key]
+            print("\t".join([key[0], key[1], "{:,}".format(n), gb(total),
+                             gb(present), gb(total - present),
+                             hours(total - present)]))
+        n, total, present = self.totals()
+        print("\t".join(["all", "", "{:,}".format(n), gb(total), gb(present),
+                         gb(total - present), hours(total - present)]))
+        print("at", "%.1f" % (self.bandwidth / 1024.0 ** 2), "MB/s")
+        if self.unknownSizes:
+            print(self.unknownSizes, "files without a known size")
+        if self.missingExps:
+            print(len(self.missingExps), "experiments skipped (no cached JSON):",
+                  ", ".join(self.missingExps[:10]) +
+                  (" ..." if len(self.missingExps) > 10 else ""))
+
+    @staticmethod
+    def addArgs(parser):
+        parser.add_argument('--plan', action="store_true", default=False,
+                            help="report what would be fetched, from cached JSON only")
+        parser.add_argument('--bandwidth', type=float, default=100.0,
+                            help="MB/s assumed by --plan time estimates")
+
+    @staticmethod
+    def fromArgs(args):
+        if not getattr(args, "plan", False):
+            return None
+        return SyncPlanner(args.bandwidth, DownloadManifest.default())
@@ -1,17 +1,40 @@
 #!/usr/bin/env python
 
 from __future__ import print_function
+import os
 import json
+from future.moves.urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 from .utils import Utils
 from .exp import Exp
+from .cache import ResponseCache
+from .json_store import JsonStore
 
 
 class QueryDCC:
+    # search results are fetched this many objects per request
+    PageSize = 100
+    # what Exp.fromJson reads; always requested when fields are selected
+    ExpFields = ["@id", "@type", "accession", "assay_term_name", "annotation_type",
+                 "description", "run_type", "biosample_term_name",
+                 "biosample_term_id", "biosample_type", "status", "lab.name",
+                 "date_released", "target", "replicates.library.biosample.age",
+                 "original_files", "revoked_files",
+                 "files.@id", "files.accession", "files.href", "files.file_type",
+                 "files.file_format", "files.output_type", "files.date_created",
+                 "files.md5sum", "files.status", "files.file_size",
+                 "files.assembly", "files.submitted_file_name",
+                 "files.biological_replicates", "files.technical_replicates",
+                 "files.replicate"]
+
     def __init__(self, host=None, auth=True, cache=None):
+        # cache: anything with getOrSet(url, fn, quiet); None for the shared
+        # ResponseCache.default(), False to always query ENCODE
         self.auth = auth
         self.host = "https://www.encodeproject.org"
         if host:
             self.host = host
+        if cache is None:
+            cache = ResponseCache.default()
         self.cache = cache
 
     def getURL(self, url, quiet=False):
@@ -48,14 +71,62 @@ class QueryDCC:
         print("found", len(eids), "ENCODE ids")
         return eids
 
-    def getExps(self, url):
-        ret = self.getURL(url)
-        ret = json.loads(ret)
+    def pageUrl(self, url, start, size, fields=None):
+        # url with its limit/from/frame replaced to ask for one page of
+        # embedded objects (only fields, if given)
+        parts = urlsplit(url)
+        params = [(k, v) for k, v in parse_qsl(parts.query)
+                  if k not in ("limit", "from", "frame")]
+        params += [("frame", "embedded"), ("limit", size), ("from", start)]
+        if fields:
+            params += [("field", f) for f in fields]
+        return urlunsplit((parts.scheme, parts.netloc, parts.path,
+                           urlencode(params), parts.fragment))
+
+    def searchPages(self, url, fields=None, quiet=False):
+        # yields each page's @graph until the search's total is reached
+        start = 0
+        while True:
+            page = json.loads(self.getURL(self.pageUrl(url, start,
+                                                       self.PageSize, fields),
+                                          quiet))
+            graph = page["@graph"]
+            if graph:
+                yield graph
+            start += len(graph)
+            if not graph or start >= page.get("total", 0):
+                return
+
+    def getExps(self, url, fields=None):
+        # experiments with their files come embedded in the search pages, so
+        # there is no request per accession; full objects (no fields
+        # selected) also refresh each experiment's cached JSON
+        if fields:
+            fields = self.ExpFields + [f for f in fields if f not in self.ExpFields]
         exps = []
-        for e in ret["@graph"]:
-            accession = e["accession"]
-            if not accession:
-                continue
-            exps.append(Exp.fromJsonFile(accession))
+        for graph in self.searchPages(url, fields, True):
+            for e in graph:
+                accession = e.get("accession")
+                if not accession:
+                    continue
+                if not fields:
+                    QueryDCC.writeExpJson(e)
+                exps.append(Exp.fromJson(e))
         print("found", len(exps), "experiments")
         return exps
+
+    @staticmethod
+    def writeExpJson(e):
+        store = JsonStore.default()
+        if store:
+            return store.put("experiment", e["accession"], json.dumps(e))
+        fnp = Exp.makeJsonFnp(e["accession"])
+        Utils.ensureDir(fnp)
+        with open(fnp + ".tmp", "w") as f:
+            json.dump(e, f)
+        os.rename(fnp + ".tmp", fnp)
+        # e may be older than what the validators were recorded for (the
+        # search page can come from the ResponseCache): drop them, so the
+        # next revalidation is a full GET rather than a 304 for a stale body
+        if os.path.exists(Utils.validatorsFnp(fnp)):
+            os.remove(Utils.validatorsFnp(fnp))
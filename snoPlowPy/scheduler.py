@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+from __future__ import print_function
+import heapq
+
+Orders = ["accession", "largest", "smallest", "binpack"]
+
+
+def expBytes(e, want=None):
+    '''
+    bytes of an experiment's files from its (dataset search) JSON; files
+    only listed by @id count as 0. want(fileJson) picks the files to count
+
+    >>> e = {"files": ["/files/ENCFF000AAA/", {"file_size": 10, "file_type": "bam"},
+    ...                {"file_size": 5, "file_type": "bigWig"}]}
+    >>> expBytes(e)
+    15
+    >>> expBytes(e, lambda f: "bigWig" == f["file_type"])
+    5
+    '''
+    total = 0
+    for f in e.get("files", []):
+        if not isinstance(f, dict):
+            continue
+        if want and not want(f):
+            continue
+        total += f.get("file_size", 0) or 0
+    return total
+
+
+def binPack(sizes, n_bins):
+    # longest-processing-time-first assignment of accessions to n_bins
+    # workers; returns the bins, each largest first
+    bins = [[] for i in range(max(1, n_bins))]
+    heap = [(0, i) for i in range(len(bins))]
+    for accession in sorted(sizes, key=lambda a: (-sizes[a], a)):
+        load, i = heapq.heappop(heap)
+        bins[i].append(accession)
+        heapq.heappush(heap, (load + sizes[accession], i))
+    return bins
+
+
+def scheduleBySize(sizes, order="accession", n_jobs=1):
+    '''
+    order accessions (keys of sizes, values bytes) for dispatch to workers
+
+    >>> sizes = {'A': 1, 'B': 50, 'C': 10, 'D': 40}
+    >>> scheduleBySize(sizes)
+    ['A', 'B', 'C', 'D']
+    >>> scheduleBySize(sizes, "largest")
+    ['B', 'D', 'C', 'A']
+    >>> scheduleBySize(sizes, "smallest")
+    ['A', 'C', 'D', 'B']
+    >>> scheduleBySize(sizes, "binpack", 2)
+    ['B', 'D', 'A', 'C']
+    '''
+    if "accession" == order:
+        return sorted(sizes)
+    if "largest" == order:
+        return sorted(sizes, key=lambda a: (-sizes[a], a))
+    if "smallest" == order:
+        return sorted(sizes, key=lambda a: (sizes[a], a))
+    if "binpack" == order:
+        # one from each worker's bin per round, so every worker gets its
+        # planned share even though joblib hands out tasks as workers free up
+        bins = binPack(sizes, n_jobs)
+        ret = []
+        for i in range(max(len(b) for b in bins) if sizes else 0):
+            ret += [b[i] for b in bins if i < len(b)]
+        return ret
+    raise Exception("unknown order " + order)
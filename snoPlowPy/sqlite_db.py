@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+
+from __future__ import print_function
+import os
+import sqlite3
+import threading
+
+from .utils import Utils
+
+
+class SqliteDb(object):
+    # a single-file sqlite database shared by threads and processes;
+    # subclasses list their CREATE statements in Schema
+    Schema = []
+
+    def __init__(self, fnp, timeout=60):
+        self.fnp = fnp
+        self.timeout = timeout
+        self._lock = threading.RLock()
+        self._conn = None
+        self._pid = None
+
+    def conn(self):
+        with self._lock:
+            # sqlite connections must not cross a fork
+            if self._conn is None or self._pid != os.getpid():
+                Utils.ensureDir(self.fnp)
+                self._conn = sqlite3.connect(self.fnp, timeout=self.timeout,
+                                             check_same_thread=False)
+                self._pid = os.getpid()
+                for stmt in self.Schema:
+                    self._conn.execute(stmt)
+                self._conn.commit()
+            return self._conn
+
+    def read(self, sql, params=()):
+        with self._lock:
+            return self.conn().execute(sql, params).fetchall()
+
+    def write(self, sql, params=()):
+        with self._lock:
+            c = self.conn()
+            with c:
+                return c.execute(sql, params).rowcount
+
+    def writeMany(self, sql, rows):
+        with self._lock:
+            c = self.conn()
+            with c:
+                c.executemany(sql, rows)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
@@ -4,6 +4,8 @@ import json
 import random
 import string
 import datetime
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
 from lxml import html
 
 
@@ -13,6 +15,171 @@ def remote_f():
             'SnoPlowPy/master/snoPlowPy/tests/data/a')
 
 
+@pytest.fixture(scope="session")
+def metadata_base(tmpdir_factory):
+    return tmpdir_factory.mktemp("metadata")
+
+
+@pytest.fixture(autouse=True)
+def metadata_basedir(metadata_base, monkeypatch):
+    # Dirs resolves under a scratch dir, before any test touches it; set
+    # per test as monkeypatch is, but the same dir since Dirs memoizes
+    monkeypatch.setenv("METADATA_BASEDIR", str(metadata_base))
+    return metadata_base
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    # keep HttpSession's backoff from slowing down tests
+    from snoPlowPy.http_session import HttpSession, RetryPolicy
+    monkeypatch.setattr(HttpSession, 'Retry', RetryPolicy(backoff=0.01,
+                                                          max_backoff=0.05))
+
+
+class LocalFileHandler(BaseHTTPRequestHandler):
+    # serves self.server.files (path -> bytes)
+    def log_message(self, *args):
+        pass
+
+    def _body(self):
+        # server.failures[path] = [(status, headers), ...]: answered in turn
+        # before the real body is served
+        if self.server.failures.get(self.path):
+            status, headers = self.server.failures[self.path].pop(0)
+            self.send_response(status)
+            for k, v in headers.items():
+                self.send_header(k, v)
+            self.end_headers()
+            return None
+        if self.path in self.server.protected and \
+                not self.headers.get("Authorization"):
+            self.send_response(403)
+            self.end_headers()
+            return None
+        if self.path not in self.server.files:
+            self.send_response(404)
+            self.end_headers()
+            return None
+        return self.server.files[self.path]
+
+    def do_HEAD(self):
+        body = self._body()
+        if body is None:
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        body = self._body()
+        if body is None:
+            return
+        # server.etags[path] = etag: sent, and honoured in If-None-Match
+        etag = self.server.etags.get(self.path)
+        if etag and etag == self.headers.get("If-None-Match"):
+            self.send_response(304)
+            self.end_headers()
+            return
+        start, end = 0, len(body) - 1
+        # a Range is only honoured if If-Range, when sent, is the current etag
+        ifRange = self.headers.get("If-Range")
+        if self.headers.get("Range") and self.server.ranges and \
+                (not ifRange or ifRange == etag):
+            start, end = self.headers["Range"].split('=')[1].split('-')
+            start = int(start)
+            end = min(int(end), len(body) - 1) if end else len(body) - 1
+            if start >= len(body):
+                self.send_response(416)
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes %d-%d/%d" %
+                             (start, end, len(body)))
+        else:
+            self.send_response(200)
+        if etag:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(end + 1 - start))
+        self.end_headers()
+        # server.truncate[path] = n: send only n bytes once, then hang up
+        n = self.server.truncate.pop(self.path, None)
+        if n is not None:
+            self.wfile.write(body[start:start + n])
+            return
+        self.wfile.write(body[start:end + 1])
+
+
+@pytest.fixture
+def local_server():
+    server = HTTPServer(("127.0.0.1", 0), LocalFileHandler)
+    server.files = {}
+    server.requests = []
+    server.truncate = {}
+    server.protected = set()
+    server.ranges = True
+    server.failures = {}
+    server.etags = {}
+    server.url = "http://127.0.0.1:%d" % server.server_port
+    t = threading.Thread(target=server.serve_forever)
+    t.daemon = True
+    t.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def encode_dirs(tmpdir, monkeypatch):
+    # point the experiment JSON and data dirs at tmpdir
+    from snoPlowPy.files_and_paths import Dirs
+    monkeypatch.setattr(Dirs, 'encode_json', str(tmpdir.join('json')))
+    monkeypatch.setattr(Dirs, 'encode_data', str(tmpdir.join('data')))
+    return tmpdir
+
+
+def make_exp_json(accession, assay_term_name="ChIP-seq", files=()):
+    # minimal experiment JSON as served by the ENCODE portal; files are
+    # (accession, file_type, file_size) tuples
+    def fileJson(fileID, file_type, file_size):
+        file_format = file_type.split()[0]
+        return {"@id": "/files/%s/" % fileID, "accession": fileID,
+                "href": "/files/%s/@@download/%s.%s" % (fileID, fileID, file_format),
+                "file_type": file_type, "file_format": file_format,
+                "output_type": "signal", "date_created": "2016-01-01",
+                "md5sum": "", "status": "released", "file_size": file_size,
+                "assembly": "GRCh38"}
+    return {"@id": "/experiments/%s/" % accession, "@type": ["Experiment"],
+            "accession": accession, "assay_term_name": assay_term_name,
+            "description": "", "biosample_term_name": "K562",
+            "biosample_term_id": "EFO:0002067", "biosample_type": "cell line",
+            "status": "released", "lab": {"name": "lab"},
+            "files": [fileJson(*f) for f in files],
+            "original_files": ["/files/%s/" % f[0] for f in files],
+            "revoked_files": []}
+
+
+@pytest.fixture
+def exp_json():
+    return make_exp_json
+
+
+@pytest.fixture
+def exp_json_file(encode_dirs):
+    # writes make_exp_json(...) where Exp.fromJsonFile looks for it
+    from snoPlowPy.exp import Exp
+    from snoPlowPy.utils import Utils
+
+    def write(accession, *args, **kwargs):
+        j = make_exp_json(accession, *args, **kwargs)
+        fnp = Exp.makeJsonFnp(accession)
+        Utils.ensureDir(fnp)
+        with open(fnp, 'w') as f:
+            json.dump(j, f)
+        return j
+    return write
+
+
 @pytest.fixture(scope='module')
 def exp_jsondata_generator():
     return fake_jsondata('experiment', 1)
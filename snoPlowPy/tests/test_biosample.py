@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import json
+
+from snoPlowPy.biosample import Biosample
+from snoPlowPy.files_and_paths import Urls
+from snoPlowPy.http_session import HttpSession
+
+
+class TestBiosample(object):
+    def test_getMany(self, tmpdir, encode_dirs, local_server, monkeypatch):
+        monkeypatch.setattr(Urls, 'base', local_server.url)
+        keyFnp = tmpdir.join('encode.txt')
+        keyFnp.write('user\npass\n')
+        monkeypatch.setattr(HttpSession, 'KeyFnp', str(keyFnp))
+        HttpSession.reset()
+        monkeypatch.setattr(Biosample, 'CacheSize', 2)
+        Biosample.clearCache()
+        ids = ['ENCBS000AA%d' % i for i in range(3)]
+        for i, accessionID in enumerate(ids):
+            local_server.files['/biosamples/%s/?format=json' % accessionID] = \
+                json.dumps({"biosample_term_name": "K562", "biosample_term_id": str(i),
+                            "biosample_type": "cell line"}).encode()
+
+        bs = Biosample.getMany(ids + ids[:1])
+        assert sorted(bs) == ids
+        assert [bs[a].biosample_term_id for a in ids] == ['0', '1', '2']
+        assert 3 == len(local_server.requests)
+
+        # only the 2 most recently used are kept
+        assert Biosample.get(ids[2]) is bs[ids[2]]
+        assert Biosample.get(ids[0]) is not bs[ids[0]]
+        assert list(Biosample._cache) == [ids[2], ids[0]]
+        Biosample.clearCache()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import json
+
+from snoPlowPy.cache import ResponseCache
+from snoPlowPy.querydcc import QueryDCC
+
+
+class TestResponseCache(object):
+    def test_getOrSet(self, tmpdir):
+        c = ResponseCache(str(tmpdir.join('c.sqlite')))
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            return b'{"a": 1}'
+        assert c.getOrSet('http://x/a', fetch) == b'{"a": 1}'
+        assert c.getOrSet('http://x/a', fetch) == b'{"a": 1}'
+        assert 1 == len(calls)
+
+        # shared with other processes through the file
+        c2 = ResponseCache(str(tmpdir.join('c.sqlite')))
+        assert c2.get('http://x/a') == b'{"a": 1}'
+
+        # failures are not cached
+        assert c.getOrSet('http://x/b', lambda: None) is None
+        assert c.get('http://x/b') is None
+
+    def test_ttl(self, tmpdir):
+        c = ResponseCache(str(tmpdir.join('c.sqlite')), ttl=-1)
+        c.set('http://x/a', b'abc')
+        assert c.get('http://x/a') is None
+
+    def test_lru(self, tmpdir):
+        c = ResponseCache(str(tmpdir.join('c.sqlite')), max_bytes=None)
+        body = b'0123456789' * 100
+        for url in ['http://x/a', 'http://x/b', 'http://x/c']:
+            c.set(url, body)
+        size = c.totalBytes() // 3
+        c.get('http://x/a')
+        c.max_bytes = size * 2
+        c.evict()
+        assert c.get('http://x/b') is None
+        assert c.get('http://x/a') == body
+        assert c.get('http://x/c') == body
+        assert c.totalBytes() <= c.max_bytes
+
+    def test_querydcc(self, tmpdir, local_server):
+        local_server.files['/a/?format=json'] = json.dumps({"x": 1}).encode()
+        q = QueryDCC(local_server.url, auth=False,
+                     cache=ResponseCache(str(tmpdir.join('c.sqlite'))))
+        assert q.getFromAlias('a', True) == {"x": 1}
+        assert q.getFromAlias('a', True) == {"x": 1}
+        assert 1 == len(local_server.requests)
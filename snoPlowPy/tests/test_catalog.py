@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import json
+
+from snoPlowPy.catalog import MetadataCatalog
+from snoPlowPy.exp import Exp
+
+
+class TestMetadataCatalog(object):
+    def test_query(self, tmpdir, exp_json_file):
+        for accession, label, biosample_type, assembly in [
+                ('ENCSR000AAA', 'H3K27ac', 'immortalized cell line', 'hg19'),
+                ('ENCSR000AAB', 'H3K27ac', 'tissue', 'hg19'),
+                ('ENCSR000AAC', 'H3K27ac', 'immortalized cell line', 'GRCh38'),
+                ('ENCSR000AAD', 'CTCF', 'immortalized cell line', 'hg19')]:
+            j = exp_json_file(accession, 'ChIP-seq', [(accession + 'F', 'bigWig', 1)])
+            j['target'] = {'label': label, 'investigated_as':
+                           ['transcription factor' if 'CTCF' == label else 'histone']}
+            j['biosample_type'] = biosample_type
+            j['files'][0]['assembly'] = assembly
+            with open(Exp.makeJsonFnp(accession), 'w') as f:
+                json.dump(j, f)
+
+        catalog = MetadataCatalog(str(tmpdir.join('catalog.sqlite')))
+        assert 4 == catalog.build(quiet=True)
+        assert catalog.query(assay_term_name='ChIP-seq', label='H3K27ac',
+                             biosample_type='immortalized cell line',
+                             assembly='hg19') == ['ENCSR000AAA']
+        assert catalog.query(target='histone%', assembly=['hg19', 'GRCh38']) == \
+            ['ENCSR000AAA', 'ENCSR000AAB', 'ENCSR000AAC']
+        assert catalog.query(file_type='bam') == []
+        assert len(catalog.query()) == 4
+        assert catalog.queryFiles(['ENCSR000AAD'], file_type='bigWig') == \
+            [('ENCSR000AAD', 'ENCSR000AADF')]
+
+        # reindexing replaces an experiment's rows
+        catalog.build(['ENCSR000AAA'], quiet=True)
+        assert 4 == len(catalog.queryFiles())
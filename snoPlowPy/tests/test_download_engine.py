@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import os
+import threading
+import time
+
+from snoPlowPy.download_engine import DownloadEngine
+
+
+class Tracker(object):
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.running = {}
+        self.peak = {}
+
+    def task(self, key, num_bytes):
+        with self.lock:
+            self.running[key] = self.running.get(key, 0) + num_bytes
+            for k, v in list(self.running.items()) + \
+                    [('all', sum(self.running.values()))]:
+                self.peak[k] = max(self.peak.get(k, 0), v)
+        time.sleep(self.delay)
+        with self.lock:
+            self.running[key] -= num_bytes
+        return key
+
+
+class TestDownloadEngine(object):
+    def test_limits(self):
+        t = Tracker()
+        with DownloadEngine(max_connections=6, max_per_host=2,
+                            max_inflight_bytes=10 ** 9) as engine:
+            futures = [engine.submit('http://h%d/x' % (i % 4), 1, t.task,
+                                     'h%d' % (i % 4), 1)
+                       for i in range(40)]
+            assert DownloadEngine.waitAll(futures) == 0
+        assert set(f.result() for f in futures) == set(['h0', 'h1', 'h2', 'h3'])
+        assert max(t.peak[k] for k in ['h0', 'h1', 'h2', 'h3']) <= 2
+        assert t.peak['all'] <= 6
+
+    def test_inflight_bytes(self):
+        t = Tracker()
+        with DownloadEngine(max_connections=8, max_per_host=8,
+                            max_inflight_bytes=100) as engine:
+            futures = [engine.submit('http://h/x', 40, t.task, 'h', 40)
+                       for i in range(10)]
+            # bigger than the whole budget: still runs, alone
+            futures.append(engine.submit('http://h/y', 500, t.task, 'h', 500))
+            assert DownloadEngine.waitAll(futures) == 0
+        assert t.peak['h'] <= 500
+        assert t.peak['all'] <= 500
+
+    def test_download(self, tmpdir, local_server):
+        for i in range(5):
+            local_server.files['/f%d' % i] = ('data %d' % i).encode()
+        with DownloadEngine(max_connections=3) as engine:
+            futures = [engine.download(local_server.url + '/f%d' % i,
+                                       os.path.join(str(tmpdir), 'f%d' % i),
+                                       skipSizeCheck=True, quiet=True)
+                       for i in range(5)]
+            assert DownloadEngine.waitAll(futures) == 0
+        for i in range(5):
+            assert tmpdir.join('f%d' % i).read() == 'data %d' % i
+
+    def test_many_queued(self):
+        # many tasks waiting all drain, within the limits
+        t = Tracker(0)
+        release = threading.Event()
+
+        def task(key):
+            release.wait()
+            return t.task(key, 1)
+        n = 20000
+        with DownloadEngine(max_connections=4, max_per_host=2) as engine:
+            futures = [engine.submit('http://h%d/x' % (i % 3), 1, task, 'h%d' % (i % 3))
+                       for i in range(n)]
+            release.set()
+            assert DownloadEngine.waitAll(futures) == 0
+        assert max(t.peak[k] for k in ['h0', 'h1', 'h2']) <= 2
+        assert t.peak['all'] <= 4
+
+    def test_wide(self):
+        # a task opening several connections is charged all of them
+        t = Tracker()
+        with DownloadEngine(max_connections=5, max_per_host=3) as engine:
+            assert 3 == engine.maxConnectionsPerTask()
+            futures = []
+            for i in range(20):
+                futures.append(engine.submitWide('http://h%d/x' % (i % 2), 1, 8,
+                                                 t.task, 'h%d' % (i % 2), 3))
+                futures.append(engine.submit('http://h%d/y' % (i % 2), 1,
+                                             t.task, 'h%d' % (i % 2), 1))
+            assert DownloadEngine.waitAll(futures) == 0
+        assert max(t.peak['h0'], t.peak['h1']) <= 3
+        assert t.peak['all'] <= 5
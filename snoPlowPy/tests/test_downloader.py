@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import json
+import argparse
+
+from snoPlowPy.downloader import Downloader
+from snoPlowPy.planner import SyncPlanner
+
+
+class Dataset(object):
+    species = "human"
+
+    def __init__(self, jsonFnp):
+        self.jsonFnp = jsonFnp
+        self.url = "http://127.0.0.1:1/search"
+
+
+class TestDownloader(object):
+    def test_exps_stream(self, tmpdir, exp_json_file):
+        exps = [exp_json_file('ENCSR000AA%d' % i, assay,
+                              [('ENCFF000AA%d' % i, 'bigWig', 10 * i)])
+                for i, assay in enumerate(['ChIP-seq', 'DNase-seq', 'ChIP-seq'])]
+        fnp = str(tmpdir.join('search.json'))
+        with open(fnp, 'w') as f:
+            json.dump({"@graph": exps, "total": 3, "facets": []}, f)
+
+        for stream in [False, True]:
+            args = argparse.Namespace(stream=stream, force=False, refresh=False, j=1)
+            planner = SyncPlanner()
+            down = Downloader(Dataset(fnp), args, planner=planner)
+            assert (down.data is None) == stream
+            assert [e["accession"] for e in down.exps("ChIP-seq")] == \
+                ['ENCSR000AA0', 'ENCSR000AA2']
+            down.chipseqs()
+            assert planner.totals() == [2, 20, 0]
+
+    def test_engine_revalidates_in_workers(self, exp_json_file, monkeypatch):
+        import threading
+        from snoPlowPy import downloader
+        from snoPlowPy.download_engine import DownloadEngine
+        ids = ['ENCSR000AA%d' % i for i in range(3)]
+        for accessionID in ids:
+            exp_json_file(accessionID, 'ChIP-seq', [])
+        threads = []
+
+        def expJsonForce(accessionID, force, refresh):
+            threads.append(threading.current_thread())
+            return False
+        monkeypatch.setattr(downloader, 'expJsonForce', expJsonForce)
+
+        with DownloadEngine(max_connections=3) as engine:
+            downloader.loadBedBigWigHdf5BamEngine(engine, ids, False, True, True)
+        assert 3 == len(threads)
+        assert threading.current_thread() not in threads
@@ -11,3 +11,174 @@ class TestExp(object):
         exp = Exp.fromJson(exp_jsondata_generator)
         assert exp.accessionID == exp.accessionID
         assert exp.accessionID == exp_jsondata_generator['accession']
+
+    def test_parsed_cache(self, exp_json_file):
+        import json
+        from snoPlowPy.parsed_cache import ParsedCache
+        j = exp_json_file('ENCSR000AAA', 'ChIP-seq', [('ENCFF000AAA', 'bigWig', 3)])
+        j['date_released'] = '2016-02-03'
+        with open(Exp.makeJsonFnp('ENCSR000AAA'), 'w') as f:
+            json.dump(j, f)
+        exp = Exp.fromJsonFile('ENCSR000AAA')
+        # plain JSON, nothing that could run code when loaded
+        with open(ParsedCache.fnp(exp.jsonFnp)) as f:
+            assert json.load(f)[1]['accession'] == 'ENCSR000AAA'
+
+        cached = Exp.fromJsonFile('ENCSR000AAA')
+        assert cached.date_released_obj == exp.date_released_obj
+        assert cached.date_released_obj.year == 2016
+        assert cached.jsondata is None
+        # every file saved parsed, even those not built when it was saved
+        assert exp.files.entries()[0][1] is None
+        assert cached.files.entries()[0][1] is not None
+        assert cached.description == exp.description
+        assert repr(cached.files) == repr(exp.files)
+        # raw JSON reloaded on demand
+        assert cached.getExpJson()['accession'] == 'ENCSR000AAA'
+        assert cached.files[0].getJson()['file_size'] == 3
+        assert cached.files[0].getControls() == []
+
+        # a changed JSON is parsed again
+        j['files'][0]['file_size'] = 4000
+        with open(exp.jsonFnp, 'w') as f:
+            json.dump(j, f)
+        assert Exp.fromJsonFile('ENCSR000AAA').files[0].file_size_bytes == 4000
+
+    def test_unreleasedFiles(self, tmpdir, exp_json_file, local_server, monkeypatch):
+        import json
+        from snoPlowPy.files_and_paths import Urls
+        from snoPlowPy.http_session import HttpSession
+        monkeypatch.setattr(Urls, 'base', local_server.url)
+        keyFnp = tmpdir.join('encode.txt')
+        keyFnp.write('user\npass\n')
+        monkeypatch.setattr(HttpSession, 'KeyFnp', str(keyFnp))
+        HttpSession.reset()
+        j = exp_json_file('ENCSR000AAA', 'ChIP-seq',
+                          [('ENCFF000AA%d' % i, 'bigWig', i) for i in range(4)])
+        # only the first is released; the others are served one by one
+        for f in j['files'][1:]:
+            local_server.files['/files/%s/?format=json' % f['accession']] = \
+                json.dumps(f).encode()
+        j['files'] = j['files'][:1]
+        exp = Exp.fromJson(j)
+
+        files = exp.unreleasedFiles(False)
+        assert [f.fileID for f in files] == ['ENCFF000AA1', 'ENCFF000AA2', 'ENCFF000AA3']
+        assert [f.file_size_bytes for f in files] == [1, 2, 3]
+        assert 3 == len(local_server.requests)
+        # cached like other file JSON
+        exp.unreleasedFiles(False)
+        assert 3 == len(local_server.requests)
+
+    def test_lazy_files(self, exp_json):
+        from snoPlowPy.exp_file import ExpFile
+        j = exp_json('ENCSR000AAA', 'ChIP-seq',
+                     [('ENCFF000AA%d' % i, t, i) for i, t in
+                      enumerate(['fastq', 'fastq', 'bigWig', 'bam', 'fastq'])])
+        j['files'][0]['derived_from'] = [{'controlled_by': ['ENCSR000CTL']}]
+        exp = Exp.fromJson(j)
+        assert 5 == len(exp.files)
+        assert [e for e in exp.files.entries() if e[1] is not None] == []
+        # only the keys parsing reads are held until built
+        assert 'derived_from' not in exp.files.entries()[0][0]
+
+        bams = exp.bamFilters()
+        assert [f.fileID for f in bams] == ['ENCFF000AA3']
+        # only the matching file was built
+        assert [e[1] for e in exp.files.entries() if e[1] is not None] == bams
+        assert exp.files.filterBy(file_type=['bam', 'bigWig'], assembly='GRCh38') == \
+            [exp.files[2], exp.files[3]]
+
+        assert isinstance(exp.files[-1], ExpFile)
+        assert exp.files[-1].fileID == 'ENCFF000AA4'
+        assert [f.file_size_bytes for f in exp.files] == list(range(5))
+        assert [f.fileID for f in exp.files[1:3]] == ['ENCFF000AA1', 'ENCFF000AA2']
+
+    def test_file_index(self, exp_json):
+        j = exp_json('ENCSR000AAA', 'ChIP-seq',
+                     [('ENCFF000AA%d' % i, t, i) for i, t in
+                      enumerate(['bigWig', 'bigWig', 'bigWig', 'bed narrowPeak',
+                                 'bed narrowPeak', 'bam'])])
+        fs = j['files']
+        fs[0]['output_type'] = 'fold change over control'
+        fs[0]['replicate'] = {'biological_replicate_number': 2,
+                              'technical_replicate_number': 1}
+        fs[1]['output_type'] = 'fold change over control'
+        fs[1]['assembly'] = 'hg19'
+        fs[1]['biological_replicates'] = [1, 2]
+        fs[3]['output_type'] = 'peaks'
+        fs[4]['output_type'] = 'optimal idr thresholded peaks'
+        fs[4]['assembly'] = 'hg19'
+        exp = Exp.fromJson(j)
+
+        # fold change, rep 2 (no pooled or rep 1) before plain signal
+        assert [f.fileID for f in exp.bigWigFilters('GRCh38')] == ['ENCFF000AA0']
+        assert [f.fileID for f in exp.bigWigFilters('hg19')] == ['ENCFF000AA1']
+        assert exp.bigWigFilters('mm10') == []
+        assert {a: [f.fileID for f in fs] for a, fs in
+                exp.bigWigFiltersByAssembly().items()} == \
+            {'GRCh38': ['ENCFF000AA0'], 'hg19': ['ENCFF000AA1']}
+        assert {a: [f.fileID for f in fs] for a, fs in
+                exp.bedFiltersByAssembly().items()} == \
+            {'GRCh38': ['ENCFF000AA3'], 'hg19': ['ENCFF000AA4']}
+        # the bam was never needed, so never built
+        assert exp.files.entries()[5][1] is None
+
+        # no bio_rep at all, as in webservice rows with a null file_bio_rep
+        has1and2 = Exp.ReplicateShapes['has1and2']
+        assert not has1and2(False, None, ())
+        assert not has1and2(False, 1, ())
+        assert has1and2(False, u'1,2', ())
+
+    def test_fromWebserviceUrl(self, local_server):
+        import json
+        import itertools
+        import pytest
+
+        def row(accession, fileID):
+            return [{"accession": accession, "age": "", "assay_term_name": "DNase-seq",
+                     "biosample_term_id": "", "biosample_term_name": "K562",
+                     "biosample_type": "cell line", "description": "", "lab": "",
+                     "label": "", "status": "released", "target": "",
+                     "file": fileID, "file_href": "/files/%s.bam" % fileID,
+                     "file_type": "bam", "file_format": "bam",
+                     "file_output_type": "alignments", "file_size_bytes": 1,
+                     "file_md5sum": "", "file_status": "released",
+                     "file_bio_rep": "1", "file_tech_rep": "1",
+                     "file_assembly": "hg19", "submitted_file_name": "",
+                     "file_ispooled": False}]
+        rows = [row("ENCSR000AAA", "ENCFF000AA0"), row("ENCSR000AAA", "ENCFF000AA1"),
+                row("ENCSR000BBB", "ENCFF000BB0"), row("ENCSR000CCC", "ENCFF000CC0")]
+        local_server.files['/all_human/'] = json.dumps(rows).encode("utf-8")
+
+        exps = Exp.fromWebserviceUrl(local_server.url + '/all_human/')
+        assert [(e.encodeID, [f.fileID for f in e.files]) for e in exps] == \
+            [("ENCSR000AAA", ["ENCFF000AA0", "ENCFF000AA1"]),
+             ("ENCSR000BBB", ["ENCFF000BB0"]),
+             ("ENCSR000CCC", ["ENCFF000CC0"])]
+
+        # an accession split across the response: no partial Exp
+        exps = Exp.fromWebserviceRows(rows + [row("ENCSR000AAA", "ENCFF000AA2")])
+        assert [e.encodeID for e in itertools.islice(exps, 3)] == \
+            ["ENCSR000AAA", "ENCSR000BBB", "ENCSR000CCC"]
+        with pytest.raises(Exception, match="ENCSR000AAA"):
+            next(exps)
+
+    def test_compact(self, exp_json_file):
+        j = exp_json_file('ENCSR000AAA', 'ChIP-seq',
+                          [('ENCFF000AA%d' % i, 'bigWig', i) for i in range(2)])
+        j['files'][1]['derived_from'] = [{'controlled_by': ['ENCSR000CTL']}]
+        import json
+        with open(Exp.makeJsonFnp('ENCSR000AAA'), 'w') as f:
+            json.dump(j, f)
+
+        exp = Exp.fromJsonFile('ENCSR000AAA')
+        assert not hasattr(exp, '__dict__')
+        assert not hasattr(exp.files[0], '__dict__')
+        # no raw JSON held once parsed...
+        assert exp.jsondata is None
+        assert exp.files[1].jsondata is None
+        assert exp.files[0].file_type is exp.files[1].file_type
+        # ...but loaded again when asked for
+        assert exp.files[1].getControls() == ['ENCSR000CTL']
+        assert exp.getExpJson()['accession'] == 'ENCSR000AAA'
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+
+from snoPlowPy.file_table import FileTable
+from snoPlowPy.exp import Exp
+
+
+class TestFileTable(object):
+    def test_matches_predicates(self, exp_json):
+        exps = [Exp.fromJson(exp_json('ENCSR000AA%d' % i, 'ChIP-seq',
+                                      [('ENCFF00%d%d' % (i, k), t, 10 * k)
+                                       for k, t in enumerate(['bigWig', 'bam', 'fastq',
+                                                              'bed narrowPeak'])]))
+                for i in range(3)]
+        t = FileTable.fromExps(exps)
+        assert len(t) == 12
+        files = [f for e in exps for f in e.files]
+        for name in FileTable.Predicates:
+            want = [f.fileID for f in files if getattr(f, name)()]
+            assert list(t.fileIDs(getattr(t, name)())) == want, name
+        assert t.totalBytes(t.isBam()) == 30
+        assert list(t.expAccessions(t.eq(accession='ENCFF0010'))) == ['ENCSR000AA1']
+
+    def test_save_load(self, tmpdir, exp_json):
+        t = FileTable.fromExps([Exp.fromJson(exp_json('ENCSR000AAA', 'DNase-seq',
+                                                      [('ENCFF000AAA', 'bigWig', 5)]))])
+        fnp = str(tmpdir.join('t.npz'))
+        t.save(fnp)
+        t2 = FileTable.load(fnp)
+        assert list(t2.fileIDs(t2.isBigWig() & t2.eq(assay_term_name='DNase-seq'))) == \
+            ['ENCFF000AAA']
+        assert t2.totalBytes() == 5
+        assert list(t2['file_type']) == ['bigWig']
+
+    def test_fromRows_stream(self):
+        # rows consumed one at a time, none kept
+        def rows():
+            for i in range(1000):
+                yield {"exp_accession": "E%d" % (i // 10), "accession": "F%d" % i,
+                       "file_type": ["bigWig", "bam"][i % 2], "file_size": i,
+                       "isPooled": i % 3 == 0}
+        t = FileTable.fromRows(rows())
+        assert len(t) == 1000
+        assert t.columns["file_type"].categories == ["bigWig", "bam"]
+        assert t.totalBytes(t.isBam()) == sum(range(1, 1000, 2))
+        assert int(t["isPooled"].sum()) == 334
+        assert list(t.fileIDs(t.eq(exp_accession="E3") & t.isBigWig())) == \
+            ["F30", "F32", "F34", "F36", "F38"]
+        assert len(FileTable.fromRows([])) == 0
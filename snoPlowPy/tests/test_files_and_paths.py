@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import os
+import sys
+import subprocess
+
+
+class TestFilesAndPaths(object):
+    def test_lazy_import(self, tmpdir):
+        # importing probes no directory: a missing metadata dir only fails
+        # once a path under it is asked for
+        env = dict(os.environ, METADATA_BASEDIR=str(tmpdir.join('missing')))
+        code = ("import snoPlowPy.exp\n"
+                "from snoPlowPy.files_and_paths import Dirs, Genome, Datasets\n"
+                "print('imported')\n"
+                "print(Dirs.encode_json)\n")
+        p = subprocess.Popen([sys.executable, "-c", code], env=env,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        out, err = p.communicate()
+        assert out.decode().startswith("imported\nmissing ENCODE metadata base folder")
+        assert 1 == p.returncode
+
+    def test_memoized(self, tmpdir, monkeypatch):
+        from snoPlowPy.files_and_paths import Dirs, Datasets, lazy
+        monkeypatch.setattr(Dirs, 'metadata_base', str(tmpdir))
+        monkeypatch.setattr(Dirs, 'encode_base', lazy(
+            lambda: os.path.join(Dirs.metadata_base, "encode")))
+        monkeypatch.setattr(Dirs, 'encode_json', lazy(
+            lambda: os.path.join(Dirs.encode_base, "json")))
+        assert Dirs.encode_json == str(tmpdir.join('encode', 'json'))
+        # now a plain attribute
+        assert Dirs.__dict__['encode_json'] == Dirs.encode_json
+        assert Datasets.all_human.webserviceAll.endswith("encode/all_human/")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import os
+import time
+from email.utils import formatdate
+
+from snoPlowPy.http_session import HttpSession, RetryPolicy, TokenBucket
+from snoPlowPy.utils import Utils
+
+
+class TestHttpSession(object):
+    def test_session_shared(self):
+        assert HttpSession.session() is HttpSession.session()
+
+    def test_credentials_cached(self, tmpdir, local_server, monkeypatch):
+        keyFnp = tmpdir.join('encode.txt')
+        keyFnp.write('user\npass\n')
+        monkeypatch.setattr(HttpSession, 'KeyFnp', str(keyFnp))
+        HttpSession.reset()
+
+        local_server.files['/private'] = b'secret'
+        local_server.protected.add('/private')
+        url = local_server.url + '/private'
+
+        assert Utils.query(url) == b'secret'
+        assert len(local_server.requests) == 2  # anonymous 403, then auth
+
+        # credentials are not re-read and the host now goes straight to auth
+        os.remove(str(keyFnp))
+        assert Utils.query(url) == b'secret'
+        assert len(local_server.requests) == 3
+        HttpSession.reset()
+
+    def test_retry(self, local_server, monkeypatch):
+        monkeypatch.setattr(HttpSession, 'Retry', RetryPolicy(3, backoff=0.01))
+        local_server.files['/a'] = b'abc'
+        local_server.failures['/a'] = [(503, {}),
+                                       (429, {'Retry-After': '0'}),
+                                       (502, {})]
+        url = local_server.url + '/a'
+        assert Utils.query(url) == b'abc'
+        assert len(local_server.requests) == 4
+
+        # gives up after Retry.retries
+        local_server.failures['/a'] = [(503, {})] * 4
+        assert Utils.query(url) is None
+        # not retried
+        assert Utils.query(local_server.url + '/missing') is None
+        assert len(local_server.requests) == 9
+
+    def test_retry_delay(self):
+        class R(object):
+            def __init__(self, headers):
+                self.headers = headers
+                self.status_code = 503
+        policy = RetryPolicy(5, backoff=1.0, max_backoff=10.0)
+        assert policy.delay(0, R({'Retry-After': '7'})) == 7
+        assert policy.delay(0, R({'Retry-After': '700'})) == 10.0
+        later = policy.delay(0, R({'Retry-After': formatdate(time.time() + 5)}))
+        assert 3 < later <= 5
+        for attempt in range(8):
+            assert 0 <= policy.delay(attempt, R({})) <= min(10.0, 2 ** attempt)
+        assert policy.shouldRetry(4, R({}))
+        assert not policy.shouldRetry(5, R({}))
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(100, 2)
+        start = time.time()
+        waits = [bucket.take() for i in range(12)]
+        assert waits[0] == 0 and waits[1] == 0
+        assert time.time() - start >= 0.09
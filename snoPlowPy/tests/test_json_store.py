@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import os
+import json
+import shutil
+
+from snoPlowPy.json_store import JsonStore
+from snoPlowPy.exp import Exp
+from snoPlowPy.files_and_paths import Dirs
+
+
+class TestJsonStore(object):
+    def test_importTree(self, exp_json_file):
+        exp_json_file('ENCSR000AAA', 'ChIP-seq', [('ENCFF000AAA', 'bigWig', 3)])
+        exp_json_file('ENCSR000AAB', 'DNase-seq', [('ENCFF000AAB', 'bam', 4)])
+        with open(Exp.makeJsonFnp('ENCSR000AAA') + '.validators', 'w') as f:
+            json.dump({"etag": '"v1"', "last_modified": "Mon, 01 Jan 2018 00:00:00 GMT"}, f)
+        assert JsonStore.default() is None
+
+        assert 2 == JsonStore.importTree(quiet=True)
+        assert JsonStore.default().read(
+            "SELECT key, etag, last_modified FROM docs ORDER BY key") == \
+            [('ENCSR000AAA', '"v1"', "Mon, 01 Jan 2018 00:00:00 GMT"),
+             ('ENCSR000AAB', None, None)]
+        shutil.rmtree(os.path.join(Dirs.encode_json, "exps"))
+
+        store = JsonStore.default()
+        assert store is not None
+        assert Exp.hasCachedJson('ENCSR000AAA')
+        assert not Exp.hasCachedJson('ENCSR000AAC')
+        exp = Exp.fromJsonFile('ENCSR000AAB')
+        assert exp.assay_term_name == 'DNase-seq'
+        assert exp.files[0].file_size_bytes == 4
+        assert exp.files[0].getJson()['file_type'] == 'bam'
+        assert not os.path.exists(Exp.makeJsonFnp('ENCSR000AAB'))
+
+    def test_fetch(self, tmpdir, local_server):
+        local_server.files['/b'] = json.dumps({"a": 1}).encode()
+        local_server.etags['/b'] = '"v1"'
+        url = local_server.url + '/b'
+        store = JsonStore(str(tmpdir.join('store.sqlite')))
+        assert store.fetch('biosample', 'B', url, auth=False) == {"a": 1}
+        assert store.fetch('biosample', 'B', url, auth=False) == {"a": 1}
+        assert 1 == len(local_server.requests)
+
+        assert store.revalidate('biosample', 'B', url, False, True) is False
+        assert local_server.requests[-1][1]['If-None-Match'] == '"v1"'
+        local_server.files['/b'] = json.dumps({"a": 2}).encode()
+        local_server.etags['/b'] = '"v2"'
+        assert store.revalidate('biosample', 'B', url, False, True) is True
+        assert store.get('biosample', 'B') == {"a": 2}
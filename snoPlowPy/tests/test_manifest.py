@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import os
+
+from snoPlowPy.manifest import DownloadManifest
+from snoPlowPy.utils import Utils
+
+
+class TestDownloadManifest(object):
+    def test_record(self, tmpdir):
+        m = DownloadManifest(str(tmpdir.join('m.sqlite')))
+        fn = tmpdir.join('a')
+        fn.write('abc')
+        fnp = str(fn)
+        assert not m.has(fnp)
+        m.record(fnp, 'http://x/a', 'ENCFF000AAA', 'md5')
+        assert m.has(fnp)
+        assert m.has(fnp, 3, 'md5')
+        assert not m.has(fnp, 4)
+        assert not m.has(fnp, 3, 'other')
+
+        # persisted for the next process
+        m2 = DownloadManifest(str(tmpdir.join('m.sqlite')))
+        assert m2.get(fnp)['accession'] == 'ENCFF000AAA'
+        assert m2.get(fnp)['size'] == 3
+
+        fn.write('abcd')
+        assert m2.verify() == [fnp]
+        assert not m2.has(fnp)
+
+    def test_download_trusts_manifest(self, tmpdir, local_server):
+        m = DownloadManifest(str(tmpdir.join('m.sqlite')))
+        local_server.files['/a'] = b'abc'
+        url = local_server.url + '/a'
+        fnp = os.path.join(str(tmpdir), 'a')
+        assert Utils.download(url, fnp, file_size_bytes=3, manifest=m,
+                              accession='ENCFF000AAA')
+        assert len(local_server.requests) == 1
+        assert m.get(fnp)['accession'] == 'ENCFF000AAA'
+
+        # no request and no stat: a missing file is not noticed
+        os.remove(fnp)
+        assert Utils.download(url, fnp, manifest=m)
+        assert len(local_server.requests) == 1
+        assert not os.path.exists(fnp)
+
+        assert Utils.download(url, fnp, force=True, manifest=m)
+        assert len(local_server.requests) == 2
+        assert os.path.exists(fnp)
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import os
+import json
+
+from snoPlowPy.metrics import DownloadMetrics
+from snoPlowPy.utils import Utils
+
+
+class TestDownloadMetrics(object):
+    def test_transfers(self, tmpdir, local_server, monkeypatch):
+        monkeypatch.setattr(DownloadMetrics, '_current', None)
+        monkeypatch.setenv(DownloadMetrics.EnvJsonl, '')
+        metrics = DownloadMetrics.startRun(str(tmpdir.join('m')))
+
+        local_server.files['/a'] = b'abc' * 1000
+        local_server.failures['/a'] = [(503, {})]
+        url = local_server.url + '/a'
+        fnp = os.path.join(str(tmpdir), 'a')
+        assert Utils.download(url, fnp, file_size_bytes=3000)
+        assert Utils.download(url, fnp, file_size_bytes=3000)
+        assert not Utils.download(local_server.url + '/missing', fnp + 'b',
+                                  skipSizeCheck=True)
+
+        s = metrics.summary()
+        assert s['fresh'] == 1
+        assert s['cache_hits'] == 1
+        assert s['failed'] == 1
+        assert s['bytes'] == 3000
+        assert s['retries'] == 1
+        assert s['mean_ttfb_seconds'] is not None
+
+        with open(metrics.jsonlFnp) as f:
+            lines = [json.loads(line) for line in f]
+        assert [x['cache_hit'] for x in lines] == [False, True, False]
+
+        total = metrics.finishRun()
+        assert total.summary()['bytes'] == 3000
+        prom = tmpdir.join('m', 'downloads.prom').read()
+        assert 'snoplow_download_transfers_total{result="fresh"} 1' in prom
+        assert 'snoplow_download_bytes_total 3000' in prom
+        assert 'snoplow_download_duration_seconds_bucket{le="+Inf"} 1' in prom
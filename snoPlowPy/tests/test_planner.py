@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import os
+
+from snoPlowPy.planner import SyncPlanner
+from snoPlowPy.downloader import isBedBigWigHdf5
+from snoPlowPy.manifest import DownloadManifest
+from snoPlowPy.utils import Utils
+from snoPlowPy.exp import Exp
+
+
+class TestSyncPlanner(object):
+    def test_plan(self, exp_json_file, capsys):
+        exp_json_file('ENCSR000AAA', 'ChIP-seq',
+                      [('ENCFF000AAA', 'bigWig', 3000), ('ENCFF000AAB', 'bam', 500),
+                       ('ENCFF000AAC', 'bed narrowPeak', 100)])
+        exp_json_file('ENCSR000AAB', 'DNase-seq', [('ENCFF000AAD', 'bigWig', 1000)])
+
+        # one bigWig already on disk
+        fnp = Exp.fromJsonFile('ENCSR000AAA').files[0].fnp()
+        Utils.ensureDir(fnp)
+        with open(fnp, 'wb') as f:
+            f.write(b'x' * 3000)
+
+        planner = SyncPlanner(bandwidth_mb=1.0)
+        planner.addAccessions(['ENCSR000AAA', 'ENCSR000AAB', 'ENCSR000MIS'],
+                              isBedBigWigHdf5)
+        assert planner.rows[('ChIP-seq', 'bigWig')] == [1, 3000, 3000]
+        assert planner.rows[('ChIP-seq', 'bed narrowPeak')] == [1, 100, 0]
+        assert planner.rows[('DNase-seq', 'bigWig')] == [1, 1000, 0]
+        assert ('ChIP-seq', 'bam') not in planner.rows
+        assert planner.totals() == [3, 4100, 3000]
+        assert planner.missingExps == ['ENCSR000MIS']
+        assert planner.seconds(1024 * 1024) == 1.0
+
+        # the same files again are not counted twice
+        planner.addAccessions(['ENCSR000AAA'], isBedBigWigHdf5)
+        assert planner.totals() == [3, 4100, 3000]
+
+        planner.report()
+        out = capsys.readouterr()[0]
+        assert "ChIP-seq\tbigWig\t1\t" in out
+        assert "ENCSR000MIS" in out
+
+    def test_plan_manifest(self, exp_json_file, tmpdir):
+        exp_json_file('ENCSR000AAA', 'ChIP-seq', [('ENCFF000AAA', 'bigWig', 3)])
+        fnp = Exp.fromJsonFile('ENCSR000AAA').files[0].fnp()
+        Utils.ensureDir(fnp)
+        with open(fnp, 'wb') as f:
+            f.write(b'abc')
+        manifest = DownloadManifest(str(tmpdir.join('m.sqlite')))
+        manifest.record(fnp, 'http://x/a', 'ENCFF000AAA', '')
+        os.remove(fnp)
+
+        planner = SyncPlanner(manifest=manifest)
+        planner.addAccessions(['ENCSR000AAA'], isBedBigWigHdf5,
+                              lambda e: e.isChipSeq())
+        # trusted like Utils.download trusts it, without a stat
+        assert planner.rows[('ChIP-seq', 'bigWig')][2] == 3
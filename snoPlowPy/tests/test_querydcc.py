@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import os
+import json
+
+from snoPlowPy.querydcc import QueryDCC
+from snoPlowPy.exp import Exp
+
+
+class TestQueryDCC(object):
+    def test_getExps(self, encode_dirs, exp_json, local_server, monkeypatch):
+        monkeypatch.setattr(QueryDCC, 'PageSize', 2)
+        exps = [exp_json('ENCSR000AA%d' % i, 'ChIP-seq',
+                         [('ENCFF000AA%d' % i, 'bigWig', i)])
+                for i in range(5)]
+        q = QueryDCC(local_server.url, auth=False, cache=False)
+        url = local_server.url + '/search/?type=Experiment&limit=all'
+        for start in range(0, 5, 2):
+            page = {"@graph": exps[start:start + 2], "total": 5}
+            pageUrl = q.pageUrl(url, start, 2)
+            local_server.files[pageUrl[len(local_server.url):]] = \
+                json.dumps(page).encode()
+
+        # validators of a JSON written before this (stale) page
+        validatorsFnp = Exp.makeJsonFnp('ENCSR000AA0') + '.validators'
+        os.makedirs(os.path.dirname(validatorsFnp))
+        with open(validatorsFnp, 'w') as f:
+            json.dump({"etag": '"newer"', "last_modified": None}, f)
+
+        ret = q.getExps(url)
+        assert not os.path.exists(validatorsFnp)
+        assert [e.accession for e in ret] == [e['accession'] for e in exps]
+        assert [e.files[0].file_size_bytes for e in ret] == list(range(5))
+        assert 3 == len(local_server.requests)
+        # per-experiment JSON cache filled in
+        assert os.path.exists(Exp.makeJsonFnp('ENCSR000AA4'))
+        assert Exp.fromJsonFile('ENCSR000AA4').files[0].fileID == 'ENCFF000AA4'
+
+    def test_pageUrl(self):
+        q = QueryDCC('http://x', cache=False)
+        url = q.pageUrl('http://x/search/?type=Experiment&limit=all', 200, 100,
+                        ['accession'])
+        assert url == ('http://x/search/?type=Experiment&frame=embedded'
+                       '&limit=100&from=200&field=accession')
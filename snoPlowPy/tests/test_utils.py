@@ -78,6 +78,168 @@ class TestUtils(object):
         Utils.download(remote_f, fn)
         assert open(fn).read() == 'testting data!!!\n'
 
+    def test_get_file_if_size_diff_redirect(self, tmpdir, local_server):
+        local_server.files['/real'] = b'redirected data'
+        local_server.failures['/link'] = [(302, {'Location': '/real'})] * 4
+        url = local_server.url + '/link'
+        fnp = Utils.get_file_if_size_diff(url, str(tmpdir))
+        assert open(fnp, 'rb').read() == b'redirected data'
+        gets = len(local_server.requests)
+        # size found through the redirect: up to date, not fetched again
+        assert Utils.get_file_if_size_diff(url, str(tmpdir)) == fnp
+        assert len(local_server.requests) == gets
+
+    def test_download_md5(self, tmpdir, local_server):
+        import hashlib
+        data = b'x' * 3000000
+        local_server.files['/big'] = data
+        url = local_server.url + '/big'
+        fn = os.path.join(str(tmpdir), 'big')
+        # bad md5: nothing written
+        assert Utils.download(url, fn, md5sum='0' * 32) is False
+        assert not os.path.exists(fn)
+        assert os.listdir(str(tmpdir)) == []
+        # good md5, written in chunks
+        md5sum = hashlib.md5(data).hexdigest()
+        assert Utils.download(url, fn, md5sum=md5sum, chunk_size=4096) is True
+        assert open(fn, 'rb').read() == data
+
+    def test_revalidate(self, tmpdir, local_server):
+        local_server.files['/e.json'] = b'{"a": 1}'
+        local_server.etags['/e.json'] = '"v1"'
+        url = local_server.url + '/e.json'
+        fn = os.path.join(str(tmpdir), 'e.json')
+        assert Utils.revalidate(url, fn, quiet=True) is True
+        assert open(fn, 'rb').read() == b'{"a": 1}'
+        mtime = os.path.getmtime(fn)
+
+        # 304: nothing rewritten
+        assert Utils.revalidate(url, fn, quiet=True) is False
+        assert local_server.requests[-1][1]['If-None-Match'] == '"v1"'
+        assert os.path.getmtime(fn) == mtime
+
+        # new ETag, same body: still not rewritten
+        local_server.etags['/e.json'] = '"v2"'
+        assert Utils.revalidate(url, fn, quiet=True) is False
+        assert os.path.getmtime(fn) == mtime
+
+        local_server.files['/e.json'] = b'{"a": 2}'
+        local_server.etags['/e.json'] = '"v3"'
+        assert Utils.revalidate(url, fn, quiet=True) is True
+        assert open(fn, 'rb').read() == b'{"a": 2}'
+
+    def test_download_resume(self, tmpdir, local_server):
+        import hashlib
+        data = bytearray(range(256)) * 4000
+        local_server.files['/big'] = bytes(data)
+        local_server.truncate['/big'] = 1000
+        url = local_server.url + '/big'
+        fn = os.path.join(str(tmpdir), 'big')
+        md5sum = hashlib.md5(data).hexdigest()
+        assert Utils.download(url, fn, None, False, len(data),
+                              md5sum=md5sum, chunk_size=100, retries=1) is True
+        assert open(fn, 'rb').read() == data
+        assert not os.path.exists(fn + '.part')
+        assert local_server.requests[-1][1]['Range'] == 'bytes=1000-'
+
+    def test_download_keeps_part(self, tmpdir, local_server):
+        import requests
+        data = b'y' * 5000
+        local_server.files['/big'] = data
+        local_server.truncate['/big'] = 1200
+        url = local_server.url + '/big'
+        fn = os.path.join(str(tmpdir), 'big')
+        try:
+            Utils.download(url, fn, None, False, len(data), chunk_size=100,
+                           retries=0)
+            assert False
+        except requests.exceptions.RequestException:
+            pass
+        assert os.path.getsize(fn + '.part') == 1200
+        # later call picks up where the last one stopped
+        assert Utils.download(url, fn, None, False, len(data)) is True
+        assert open(fn, 'rb').read() == data
+
+    def test_download_changed_remote(self, tmpdir, local_server):
+        import requests
+        local_server.files['/g'] = b'old-version-content'
+        local_server.etags['/g'] = '"v1"'
+        local_server.truncate['/g'] = 6
+        url = local_server.url + '/g'
+        fn = os.path.join(str(tmpdir), 'g')
+        try:
+            Utils.download(url, fn, None, False, 19, chunk_size=2, retries=0)
+            assert False
+        except requests.exceptions.RequestException:
+            pass
+        assert open(fn + '.part', 'rb').read() == b'old-ve'
+
+        # changed remotely: the If-Range fails, and the whole new file is fetched
+        local_server.files['/g'] = b'new-version-content'
+        local_server.etags['/g'] = '"v2"'
+        assert Utils.download(url, fn, None, False, 19) is True
+        assert local_server.requests[-1][1]['If-Range'] == '"v1"'
+        assert open(fn, 'rb').read() == b'new-version-content'
+        assert os.listdir(str(tmpdir)) == ['g']
+
+        # a part of unknown origin is not continued
+        os.remove(fn)
+        with open(fn + '.part', 'wb') as f:
+            f.write(b'OLDOLD')
+        assert Utils.download(url, fn, None, False, 19) is True
+        assert open(fn, 'rb').read() == b'new-version-content'
+
+        # nor is one whose Content-Range total is not the expected size
+        os.remove(fn)
+        with open(fn + '.part', 'wb') as f:
+            f.write(b'new-ve')
+        with open(fn + '.part.validators', 'w') as f:
+            f.write('{"etag": "\\"v2\\"", "last_modified": null}')
+        assert Utils.download(url, fn, None, False, 25, skipSizeCheck=True) is False
+        assert os.listdir(str(tmpdir)) == []
+
+    def test_downloadSegmented(self, tmpdir, local_server):
+        import hashlib
+        data = bytearray(range(256)) * 4000
+        local_server.files['/big'] = bytes(data)
+        url = local_server.url + '/big'
+        fn = os.path.join(str(tmpdir), 'big')
+        md5sum = hashlib.md5(data).hexdigest()
+        assert Utils.downloadSegmented(url, fn, None, False, len(data),
+                                       md5sum=md5sum, connections=4,
+                                       segment_bytes=100000) is True
+        assert open(fn, 'rb').read() == data
+        assert os.listdir(str(tmpdir)) == ['big']
+        ranges = sorted(r[1]['Range'] for r in local_server.requests)
+        assert len(ranges) == 11
+        assert 'bytes=1000000-1023999' in ranges
+
+    def test_downloadSegmented_resume(self, tmpdir, local_server):
+        data = bytearray(range(256)) * 1000
+        local_server.files['/big'] = bytes(data)
+        url = local_server.url + '/big'
+        fn = os.path.join(str(tmpdir), 'big')
+        # first half already in place from an earlier run
+        with open(fn + '.part', 'wb') as f:
+            f.write(data[:128000])
+            f.truncate(len(data))
+        with open(fn + '.part.segments', 'w') as f:
+            f.write('0\n64000\n')
+        assert Utils.downloadSegmented(url, fn, None, False, len(data),
+                                       segment_bytes=64000) is True
+        assert open(fn, 'rb').read() == data
+        assert len(local_server.requests) == 2
+
+    def test_downloadSegmented_no_ranges(self, tmpdir, local_server):
+        data = b'z' * 50000
+        local_server.files['/big'] = data
+        local_server.ranges = False
+        fn = os.path.join(str(tmpdir), 'big')
+        assert Utils.downloadSegmented(local_server.url + '/big', fn, None,
+                                       False, len(data),
+                                       segment_bytes=10000) is True
+        assert open(fn, 'rb').read() == data
+
     def test_query(self, remote_f):
         # wrong url
         url = 'https://github.com/kepbod/tmp'
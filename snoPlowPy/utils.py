@@ -15,14 +15,18 @@ import tarfile
 import zipfile
 from future.moves.urllib.request import urlretrieve, urlopen
 from builtins import str
-import tempfile
 import time
+import threading
 from subprocess import Popen, PIPE
 import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
 
-from requests.auth import HTTPBasicAuth
 import requests
 
+from .http_session import HttpSession
+from .metrics import Transfer
+
 
 def printWroteNumLines(fnp):
     print("\twrote", fnp, '(' + "{:,}".format(numLines(fnp)) + ' lines)')
@@ -95,36 +99,37 @@ class Utils:
     def get_file_if_size_diff(url, d):
         fn = url.split('/')[-1]
         out_fnp = os.path.join(d, fn)
-        net_file_size = int(urlopen(url).info()['Content-Length'])
+        if url.startswith("ftp://"):
+            net_file_size = int(urlopen(url).info()['Content-Length'])
+        else:
+            net_file_size = Utils.getHttpFileSizeBytes(url, None, allow_redirects=True)
         if os.path.exists(out_fnp):
             fn_size = os.path.getsize(out_fnp)
             if fn_size == net_file_size:
                 print("skipping download of", fn)
                 return out_fnp
+            if net_file_size is None or net_file_size < 0:
+                print("remote size unknown; keeping", out_fnp)
+                return out_fnp
             else:
                 print("files sizes differed:")
                 print("\t", "on disk:", fn_size)
                 print("\t", "from net:", net_file_size)
+                os.remove(out_fnp)
+                Utils.discardPart(out_fnp + ".part")
         print("retrieving", fn)
-        urlretrieve(url, out_fnp)
+        if not Utils.download(url, out_fnp, None, False,
+                              max(net_file_size or 0, 0),
+                              skipSizeCheck=True, quiet=True):
+            raise Exception("could not download " + url)
         return out_fnp
 
     @staticmethod
-    def getHttpFileSizeBytes(url, auth):
+    def getHttpFileSizeBytes(url, auth, allow_redirects=False):
         if url.startswith("ftp://"):
             return None
 
-        if not auth:
-            r = requests.head(url)
-        if auth or 403 == r.status_code:
-            keyFnp = os.path.expanduser('~/.encode.txt')
-            if os.path.exists(keyFnp):
-                with open(keyFnp) as f:
-                    toks = f.read().strip().split('\n')
-                r = requests.head(url, auth=HTTPBasicAuth(toks[0], toks[1]))
-            else:
-                raise Exception("no ENCODE password file found at: " +
-                                keyFnp)
+        r = HttpSession.head(url, auth, allow_redirects=allow_redirects)
         if 200 != r.status_code:
             print("could not get file size for", url)
             print("status_code:", r.status_code)
@@ -141,15 +146,163 @@ class Utils:
         if not quiet:
             print(*args)
 
+    @staticmethod
+    def getStream(url, auth, headers=None, transfer=None):
+        return HttpSession.get(url, auth, headers=headers, stream=True,
+                               transfer=transfer)
+
+    @staticmethod
+    def streamToFile(r, fnp, chunk_size=1048576, mode="wb", _hex=None,
+                     transfer=None):
+        # write response body to fnp chunk by chunk, returning its md5;
+        # pass mode "ab" and a primed _hex to continue an existing file
+        if _hex is None:
+            _hex = hashlib.md5()
+        with open(fnp, mode) as f:
+            for chunk in r.iter_content(chunk_size):
+                if chunk:
+                    f.write(chunk)
+                    _hex.update(chunk)
+                    if transfer is not None:
+                        transfer.addBytes(len(chunk))
+        return _hex.hexdigest()
+
+    @staticmethod
+    def discardPart(partFnp):
+        # partFnp and what resumeDownload/downloadSegmented keep beside it
+        for fnp in [partFnp, partFnp + ".segments", Utils.validatorsFnp(partFnp)]:
+            if os.path.exists(fnp):
+                os.remove(fnp)
+
+    @staticmethod
+    def resumeDownload(url, partFnp, auth=None, file_size_bytes=0,
+                       md5sum=None, chunk_size=1048576, quiet=False,
+                       transfer=None):
+        # fetch url into partFnp, continuing from whatever partFnp already
+        # holds via a Range request; returns True once partFnp is complete.
+        # The ETag/Last-Modified of the response that started partFnp are
+        # kept in validatorsFnp(partFnp) and sent as If-Range, so a changed
+        # remote file is fetched whole instead of appended to the old part
+        if file_size_bytes is None or file_size_bytes < 0:
+            file_size_bytes = 0  # unknown, e.g. no Content-Length on the HEAD
+        validatorsFnp = Utils.validatorsFnp(partFnp)
+        offset = 0
+        if os.path.exists(partFnp + ".segments"):
+            # left by downloadSegmented: sparse, so can't be continued in order
+            Utils.discardPart(partFnp)
+        if os.path.exists(partFnp) and not os.path.exists(validatorsFnp):
+            # not started by resumeDownload: unknown version, so not continued
+            Utils.discardPart(partFnp)
+        if os.path.exists(partFnp):
+            offset = os.path.getsize(partFnp)
+            if file_size_bytes and offset > file_size_bytes:
+                Utils.discardPart(partFnp)
+                offset = 0
+
+        headers = {}
+        if offset:
+            headers["Range"] = "bytes=%d-" % offset
+            with open(validatorsFnp) as f:
+                validators = json.load(f)
+            etag = validators.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["If-Range"] = etag
+            elif validators.get("last_modified"):
+                headers["If-Range"] = validators["last_modified"]
+        r = Utils.getStream(url, auth, headers, transfer)
+
+        if 416 == r.status_code and offset:
+            r.close()
+            if offset != file_size_bytes:
+                # range no longer valid for the remote file; start over
+                Utils.discardPart(partFnp)
+                return Utils.resumeDownload(url, partFnp, auth, file_size_bytes,
+                                            md5sum, chunk_size, quiet, transfer)
+            digest = Utils.md5(partFnp, chunk_size)
+        elif 206 == r.status_code and offset:
+            contentRange = r.headers.get("Content-Range", "")
+            total = contentRange.rpartition("/")[2]
+            if not contentRange.startswith("bytes %d-" % offset) or \
+                    (file_size_bytes and total != str(file_size_bytes)):
+                # not the continuation of this part, or another version of
+                # the file: start over
+                r.close()
+                Utils.discardPart(partFnp)
+                return Utils.resumeDownload(url, partFnp, auth, file_size_bytes,
+                                            md5sum, chunk_size, quiet, transfer)
+            Utils.quietPrint(quiet, "\tresuming at byte", offset)
+            _hex = hashlib.md5()
+            with open(partFnp, 'rb') as f:
+                for chunk in iter(lambda: f.read(chunk_size), b''):
+                    _hex.update(chunk)
+            try:
+                digest = Utils.streamToFile(r, partFnp, chunk_size, "ab", _hex,
+                                            transfer)
+            finally:
+                r.close()
+        elif 200 == r.status_code:
+            # a new part (also what a failed If-Range gets): note its version
+            with open(validatorsFnp, "w") as f:
+                json.dump({"etag": r.headers.get("ETag"),
+                           "last_modified": r.headers.get("Last-Modified")}, f)
+            try:
+                digest = Utils.streamToFile(r, partFnp, chunk_size,
+                                            transfer=transfer)
+            finally:
+                r.close()
+        else:
+            r.close()
+            Utils.quietPrint(quiet, "could not download", url)
+            Utils.quietPrint(quiet, "status_code:", r.status_code)
+            return False
+
+        if file_size_bytes and os.path.getsize(partFnp) != file_size_bytes:
+            Utils.quietPrint(quiet, "size mismatch for", url, "expected:",
+                             file_size_bytes, "got:", os.path.getsize(partFnp))
+            Utils.discardPart(partFnp)
+            return False
+
+        if md5sum and digest != md5sum:
+            Utils.discardPart(partFnp)
+            Utils.quietPrint(quiet, "md5 mismatch for", url)
+            Utils.quietPrint(quiet, "\t", "expected:", md5sum)
+            Utils.quietPrint(quiet, "\t", "got:", digest)
+            return False
+        return True
+
     @staticmethod
     def download(url, fnp, auth=None, force=None,
                  file_size_bytes=0, skipSizeCheck=None,
-                 quiet=False, umask=FileUmask):
+                 quiet=False, umask=FileUmask, md5sum=None,
+                 chunk_size=1048576, retries=3, manifest=None, accession=None):
+        # every call is measured as a metrics.Transfer
+        transfer = Transfer(url, fnp)
+        try:
+            ok = Utils._download(url, fnp, auth, force, file_size_bytes,
+                                 skipSizeCheck, quiet, umask, md5sum,
+                                 chunk_size, retries, manifest, accession,
+                                 transfer)
+        except Exception:
+            transfer.finish(False)
+            raise
+        return transfer.finish(ok)
+
+    @staticmethod
+    def _download(url, fnp, auth, force, file_size_bytes, skipSizeCheck,
+                  quiet, umask, md5sum, chunk_size, retries, manifest,
+                  accession, transfer):
+        # with a DownloadManifest, files it lists are trusted without any
+        # HEAD request or stat, and completed downloads are added to it
+        if manifest is not None and not force and \
+                manifest.has(fnp, file_size_bytes, md5sum):
+            transfer.cache_hit = True
+            return True
         Utils.ensureDir(fnp)
+        partFnp = fnp + ".part"
         if not skipSizeCheck:
             if 0 == file_size_bytes:
                 fsb = Utils.getHttpFileSizeBytes(url, auth)
-                if fsb:
+                if fsb and fsb > 0:
                     file_size_bytes = fsb
             Utils.deleteFileIfSizeNotMatch(fnp, file_size_bytes)
 
@@ -157,7 +310,12 @@ class Utils:
             if force:
                 os.remove(fnp)
             else:
+                if manifest is not None:
+                    manifest.record(fnp, url, accession, md5sum)
+                transfer.cache_hit = True
                 return True
+        if force:
+            Utils.discardPart(partFnp)
 
         Utils.quietPrint(quiet, "downloading", url, "...")
 
@@ -167,49 +325,190 @@ class Utils:
             # chmod g+w
             st = os.stat(fnp)
             os.chmod(fnp, st.st_mode | umask)
+            if manifest is not None:
+                manifest.record(fnp, url, accession, md5sum)
             return True
 
-        if not auth:
-            r = requests.get(url)
-        if auth or 403 == r.status_code:
-            keyFnp = os.path.expanduser('~/.encode.txt')
-            if os.path.exists(keyFnp):
-                with open(keyFnp) as f:
-                    toks = f.read().strip().split('\n')
-                r = requests.get(url, auth=HTTPBasicAuth(toks[0], toks[1]))
-            else:
-                raise Exception("no ENCODE password file found at: " +
-                                keyFnp)
-        if 200 != r.status_code:
-            Utils.quietPrint(quiet, "could not download", url)
-            Utils.quietPrint(quiet, "status_code:", r.status_code)
+        # partial data is kept in partFnp so an interrupted transfer can be
+        # continued, by a retry here or by a later call, instead of restarted
+        for attempt in range(retries + 1):
+            try:
+                ok = Utils.resumeDownload(url, partFnp, auth, file_size_bytes,
+                                          md5sum, chunk_size, quiet, transfer)
+                break
+            except (requests.exceptions.ConnectionError,
+                    requests.exceptions.ChunkedEncodingError,
+                    requests.exceptions.Timeout):
+                if attempt == retries:
+                    raise
+                transfer.retried()
+                Utils.quietPrint(quiet, "\tinterrupted download of", url)
+        if not ok:
             return False
+        shutil.move(partFnp, fnp)
+        Utils.discardPart(partFnp)  # its validators
+        # chmod g+w
+        st = os.stat(fnp)
+        os.chmod(fnp, st.st_mode | umask)
+        if manifest is not None:
+            manifest.record(fnp, url, accession, md5sum)
+        return True
+
+    @staticmethod
+    def fetchSegment(url, partFnp, start, end, auth=None, chunk_size=1048576,
+                     transfer=None):
+        # write bytes start..end (inclusive) of url at the same offset in
+        # partFnp; returns False if the server would not serve the range
+        r = Utils.getStream(url, auth, {"Range": "bytes=%d-%d" % (start, end)},
+                            transfer)
+        try:
+            contentRange = r.headers.get("Content-Range", "")
+            if 206 != r.status_code or \
+                    not contentRange.startswith("bytes %d-" % start):
+                return False
+            written = 0
+            with open(partFnp, "r+b") as f:
+                f.seek(start)
+                for chunk in r.iter_content(chunk_size):
+                    if chunk:
+                        f.write(chunk)
+                        written += len(chunk)
+                        if transfer is not None:
+                            transfer.addBytes(len(chunk))
+        finally:
+            r.close()
+        if written != end - start + 1:
+            raise requests.exceptions.ChunkedEncodingError(
+                "short segment %d-%d of %s" % (start, end, url))
+        return True
 
-        # with open(fnpTmp, "wb") as f:
-        with tempfile.NamedTemporaryFile("wb", delete=False) as f:
-            f.write(r.content)
-            fnpTmp = f.name
-        shutil.move(fnpTmp, fnp)
+    @staticmethod
+    def downloadSegmented(url, fnp, auth=None, force=None, file_size_bytes=0,
+                          quiet=False, umask=FileUmask, md5sum=None,
+                          connections=8, segment_bytes=64 * 1024 * 1024,
+                          chunk_size=1048576, retries=3, manifest=None,
+                          accession=None):
+        # fetch a large file over several connections: byte ranges are
+        # written in place into a preallocated <fnp>.part, finished ranges
+        # are listed in <fnp>.part.segments so a rerun only fetches the rest
+        if not file_size_bytes:
+            return Utils.download(url, fnp, auth, force, file_size_bytes,
+                                  quiet=quiet, umask=umask, md5sum=md5sum,
+                                  chunk_size=chunk_size, retries=retries,
+                                  manifest=manifest, accession=accession)
+        transfer = Transfer(url, fnp)
+        try:
+            ok = Utils._downloadSegmented(url, fnp, auth, force, file_size_bytes,
+                                          quiet, umask, md5sum, connections,
+                                          segment_bytes, chunk_size, retries,
+                                          manifest, accession, transfer)
+        except Exception:
+            transfer.finish(False)
+            raise
+        return transfer.finish(ok)
+
+    @staticmethod
+    def _downloadSegmented(url, fnp, auth, force, file_size_bytes, quiet, umask,
+                           md5sum, connections, segment_bytes, chunk_size,
+                           retries, manifest, accession, transfer):
+        if manifest is not None and not force and \
+                manifest.has(fnp, file_size_bytes, md5sum):
+            transfer.cache_hit = True
+            return True
+        Utils.ensureDir(fnp)
+        Utils.deleteFileIfSizeNotMatch(fnp, file_size_bytes)
+        partFnp = fnp + ".part"
+        segmentsFnp = partFnp + ".segments"
+        if os.path.exists(fnp):
+            if force:
+                os.remove(fnp)
+            else:
+                if manifest is not None:
+                    manifest.record(fnp, url, accession, md5sum)
+                transfer.cache_hit = True
+                return True
+        if force:
+            for f in [partFnp, segmentsFnp]:
+                if os.path.exists(f):
+                    os.remove(f)
+
+        starts = list(range(0, file_size_bytes, segment_bytes))
+        done = set()
+        if os.path.exists(segmentsFnp):
+            with open(segmentsFnp) as f:
+                done = set(int(line) for line in f if line.strip())
+        elif os.path.exists(partFnp):
+            # in-order partial file from Utils.download: keep whole segments
+            prefix = os.path.getsize(partFnp)
+            done = set(st for st in starts
+                       if st + segment_bytes <= min(prefix, file_size_bytes))
+        with open(partFnp, "ab") as f:
+            f.truncate(file_size_bytes)
+        if not os.path.exists(segmentsFnp):
+            with open(segmentsFnp, "w") as f:
+                f.write("".join("%d\n" % st for st in sorted(done)))
+
+        Utils.quietPrint(quiet, "downloading", url, "in",
+                         len(starts) - len(done), "segments ...")
+        lock = threading.Lock()
+
+        def fetch(start):
+            end = min(start + segment_bytes, file_size_bytes) - 1
+            for attempt in range(retries + 1):
+                try:
+                    if not Utils.fetchSegment(url, partFnp, start, end, auth,
+                                              chunk_size, transfer):
+                        return False
+                    break
+                except (requests.exceptions.ConnectionError,
+                        requests.exceptions.ChunkedEncodingError,
+                        requests.exceptions.Timeout):
+                    if attempt == retries:
+                        raise
+                    transfer.retried()
+            with lock:
+                with open(segmentsFnp, "a") as f:
+                    f.write("%d\n" % start)
+            return True
+
+        todo = [st for st in starts if st not in done]
+        pool = ThreadPoolExecutor(max_workers=max(1, min(connections, len(todo))))
+        try:
+            ranged = all(list(pool.map(fetch, todo)))
+        finally:
+            pool.shutdown()
+
+        if not ranged:
+            # no range support; fall back to a single stream
+            Utils.quietPrint(quiet, "\tranges not supported, downloading", url)
+            os.remove(partFnp)
+            os.remove(segmentsFnp)
+            return Utils._download(url, fnp, auth, force, file_size_bytes,
+                                   True, quiet, umask, md5sum, chunk_size,
+                                   retries, manifest, accession, transfer)
+
+        os.remove(segmentsFnp)
+        if md5sum:
+            digest = Utils.md5(partFnp, chunk_size)
+            if digest != md5sum:
+                os.remove(partFnp)
+                Utils.quietPrint(quiet, "md5 mismatch for", url)
+                Utils.quietPrint(quiet, "\t", "expected:", md5sum)
+                Utils.quietPrint(quiet, "\t", "got:", digest)
+                return False
+        shutil.move(partFnp, fnp)
         # chmod g+w
         st = os.stat(fnp)
         os.chmod(fnp, st.st_mode | umask)
+        if manifest is not None:
+            manifest.record(fnp, url, accession, md5sum)
         return True
 
     @staticmethod
     def query(url, auth=None, quiet=False):
         Utils.quietPrint(quiet, "downloading", url, "...")
 
-        if not auth:
-            r = requests.get(url)
-        if auth or 403 == r.status_code:
-            keyFnp = os.path.expanduser('~/.encode.txt')
-            if os.path.exists(keyFnp):
-                with open(keyFnp) as f:
-                    toks = f.read().strip().split('\n')
-                r = requests.get(url, auth=HTTPBasicAuth(toks[0], toks[1]))
-            else:
-                raise Exception("no ENCODE password file found at: " +
-                                keyFnp)
+        r = HttpSession.get(url, auth)
         if 200 != r.status_code:
             Utils.quietPrint(quiet, "could not download", url)
             Utils.quietPrint(quiet, "status_code:", r.status_code)
@@ -217,6 +516,52 @@ class Utils:
 
         return r.content
 
+    @staticmethod
+    def validatorsFnp(fnp):
+        # ETag and Last-Modified of the copy at fnp, as JSON; whatever else
+        # writes fnp must remove it
+        return fnp + ".validators"
+
+    @staticmethod
+    def revalidate(url, fnp, auth=None, quiet=False):
+        # conditional GET of url against the copy at fnp, using the ETag and
+        # Last-Modified kept in validatorsFnp(fnp); fnp is only rewritten
+        # if the body changed. Returns True if it did
+        validatorsFnp = Utils.validatorsFnp(fnp)
+        validators = {}
+        if os.path.exists(fnp) and os.path.exists(validatorsFnp):
+            with open(validatorsFnp) as f:
+                validators = json.load(f)
+        headers = {}
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+        r = HttpSession.get(url, auth, headers=headers)
+        if 304 == r.status_code:
+            Utils.quietPrint(quiet, "not modified", url)
+            return False
+        if 200 != r.status_code:
+            Utils.quietPrint(quiet, "could not revalidate", url,
+                             "status_code:", r.status_code)
+            return False
+
+        changed = True
+        if os.path.exists(fnp):
+            with open(fnp, "rb") as f:
+                changed = f.read() != r.content
+        if changed:
+            Utils.ensureDir(fnp)
+            with open(fnp + ".tmp", "wb") as f:
+                f.write(r.content)
+            os.rename(fnp + ".tmp", fnp)
+        with open(validatorsFnp, "w") as f:
+            json.dump({"etag": r.headers.get("ETag"),
+                       "last_modified": r.headers.get("Last-Modified")}, f)
+        Utils.quietPrint(quiet, "changed" if changed else "unchanged", url)
+        return changed
+
     @staticmethod
     def sanitize(s):
         return re.sub(r'\W+', '', s).lower()
@@ -386,7 +731,7 @@ class Utils:
     def checkIfUrlExists(url):
         # http://stackoverflow.com/a/19582542
         try:
-            ret = requests.head(url)
+            ret = HttpSession.head(url)
             return ret.status_code == 200
         except:
             return False